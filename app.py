@@ -1,16 +1,18 @@
 # Libraries
+import os
 from dash import dcc, html, Dash
 from dash.dependencies import Output, Input
 import dash_bootstrap_components as dbc
 import feffery_markdown_components as fmc
 
 from utils.app_setup import (
-    YEAR_PLACE_OPTIONS,
-    PLACE_YEAR_OPTIONS,
-    ALL_YEARS,
-    footer_string,
+    ref_df, ALL_YEARS,
     geodata_map, geodata_plot
 )
+from utils.server_metrics import init_server_metrics
+from utils.figures import init_figure_routes, start_prewarm
+from utils.serving import build_serving_dataset, serving_dataset
+from utils.bulk_export import init_export_routes
 
 # -- -- --
 # Folders
@@ -42,6 +44,30 @@ app = Dash(__name__,
            external_stylesheets=[dbc.themes.SIMPLEX, "assets/style.css"],
            meta_tags = [{"name": "viewport", "content": "width=device-width, initial-scale=1"}])
 server = app.server
+
+# Opt-in server metrics on /metrics, with optional sampled profiling of slow requests
+if os.environ.get('SERVER_METRICS') == '1':
+    init_server_metrics(server,
+                        profile_sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+                        profile_slow_ms     = float(os.environ.get('PROFILE_SLOW_MS', 1000)))
+
+# Build (if the masterfiles changed) and attach to the memory-mapped serving dataset of the server routes, before
+# gunicorn forks its workers (with `preload_app`). The serving dataset is not committed.
+if os.environ.get('SERVER_FIGURES') == '1' or os.environ.get('BULK_EXPORT') == '1':
+    build_serving_dataset()
+    serving_dataset()
+
+# Opt-in server-side rendered figures on /figures/..., for slow or non-JS clients
+if os.environ.get('SERVER_FIGURES') == '1':
+    init_figure_routes(server,
+                       places         = ref_df['ABBREV_NAME'].tolist(),
+                       default_year   = ALL_YEARS[-1],
+                       max_entries    = int(os.environ.get('FIGURE_CACHE_SIZE', 256)),
+                       prewarm_places = os.environ.get('PREWARM_PLACES', 'LongBeach').split(','))
+
+# Opt-in bulk exports of tract rent data on /export, streamed as CSV, Parquet or GeoJSON
+if os.environ.get('BULK_EXPORT') == '1':
+    init_export_routes(server)
 app.title = 'Contract Rents in Los Angeles County'
 
 
@@ -84,28 +110,36 @@ app.layout = dbc.Container([
         dbc.Col([
             dcc.Dropdown(id          = 'place-dropdown',
                          placeholder = 'Select a place',
-                         options     = YEAR_PLACE_OPTIONS[2023],
+                         options     = [{'label': html.Span(['Long Beach'], style = {'color': '#151E3D'}), 'value': 'LongBeach'}],
                          value       = 'LongBeach',
                          clearable   = False
                         )],
-            width = 12, sm = 12, xl = 4,
+            width = 12, sm = 12, xl = 3,
             style = {'margin': '0 0', 'padding': '30px 1.25% 0px 1.25%'}),
         dbc.Col([
             dcc.Dropdown(id          = 'year-dropdown',
                          placeholder = 'Select a year',
-                         options     = PLACE_YEAR_OPTIONS['LongBeach'],
+                         options     = [{'label': html.Span([2023], style = {'color': '#151E3D'}), 'value': 2023}],
                          value       = 2023,
                          clearable   = False,
                          searchable  = False
                          )],
-            width = 12, sm = 12, xl = 3,
+            width = 12, sm = 12, xl = 2,
             style = {'margin': '0 0', 'padding': '30px 1.25% 0px 1.25%'}),
         dbc.Col([
             dcc.Dropdown(id          = 'census-tract-dropdown',
                          placeholder = 'Click on a census tract in the map',
                          clearable   = True
                         )],
-            width = 12, sm = 12, xl = 5,
+            width = 12, sm = 12, xl = 4,
+            style = {'margin': '0 0', 'padding': '30px 1.25% 0px 1.25%'}),
+        dbc.Col([
+            dcc.Dropdown(id          = 'base-year-dropdown',
+                         placeholder = 'Mark significant increases since',
+                         clearable   = True,
+                         searchable  = False
+                        )],
+            width = 12, sm = 12, xl = 3,
             style = {'margin': '0 0', 'padding': '30px 1.25% 0px 1.25%'})
         ], align = 'center', justify = 'center')
     ], style = {'padding': '0px 2.00% 10px 2.00%'}),
@@ -118,6 +152,12 @@ app.layout = dbc.Container([
                     dbc.CardHeader(children = [html.B("Median Contract Rents"), " in ", html.B(id="map-title1"), " by Census Tract, ", html.B(id="map-title2")],
                                    style    = {'background-color': MaroonRed_color, 'color': '#FFFFFF'}),
                     dbc.CardBody([
+                        dbc.Switch(id         = 'play-years',
+                                   label      = 'Play years',
+                                   value      = False,
+                                   style      = {'color': ObsidianBlack_color, 'font-family': 'Trebuchet MS, sans-serif'}),
+                        html.Small(id    = 'play-note',
+                                   style = {'color': ObsidianBlack_color, 'font-family': 'Trebuchet MS, sans-serif'}),
                         dcc.Loading(color   = '#29B0F0',
                                     display = 'show',
                                     style   = {'position': 'relative', 'margin-top': '75%'}),
@@ -136,9 +176,29 @@ app.layout = dbc.Container([
         ], align = 'center', justify = 'center')
     ], style = {'padding': '10px 1.05% 20px 1.05%'}),
 
+    # Summary
+    html.Div([
+        dbc.Card([
+            dbc.CardHeader(children = [html.B("Rent Summary"), " for ", html.B(id="summary-title1"), ", ", html.B(id="summary-title2")],
+                           style    = {'background-color': MaroonRed_color, 'color': '#FFFFFF'}),
+            dbc.CardBody([dcc.Markdown(id = 'rent-summary')],
+                         style = {'background-color': AlabasterWhite_color})
+        ])
+    ], style = {'padding': '0px 1.05% 20px 1.05%'}),
+
+    # Similar tracts
+    html.Div([
+        dbc.Card([
+            dbc.CardHeader(children = [html.B("Tracts with Similar Rent Trends"), " to ", html.B(id="similar-title")],
+                           style    = {'background-color': Teal_color, 'color': '#FFFFFF'}),
+            dbc.CardBody([dcc.Markdown(id = 'similar-tracts')],
+                         style = {'background-color': AlabasterWhite_color})
+        ])
+    ], style = {'padding': '0px 1.05% 20px 1.05%'}),
+
     # Footer
     html.Div([
-        fmc.FefferyMarkdown(markdownStr    = footer_string,
+        fmc.FefferyMarkdown(id             = 'footer',
                             renderHtml     = True,
                             style          = {'background': LightBrown_color, 'margin-top': '1em', 'padding': '0px 2.0% 0px 2.0%'}
                            )
@@ -147,8 +207,10 @@ app.layout = dbc.Container([
     # Data
     dcc.Store( id = 'MASTERFILE' ),
     dcc.Store( id = 'LAT-LON' ),
-    dcc.Store( id = 'YEAR_PLACE_OPTIONS', data = YEAR_PLACE_OPTIONS ),
-    dcc.Store( id = 'PLACE_YEAR_OPTIONS', data = PLACE_YEAR_OPTIONS ),
+    dcc.Store( id = 'STATISTICS' ),
+    dcc.Store( id = 'SIGNIFICANCE' ),
+    dcc.Store( id = 'AVAILABILITY' ),
+    dcc.Store( id = 'TRENDS' ),
 
 ], style = {'background-color': LightBrown_color, "padding": "0px 0px 20px 0px"})
 
@@ -159,19 +221,30 @@ app.layout = dbc.Container([
 # Data:
 #  place value -> masterfile data
 #  year value -> lat/lon center point data
+#  year value -> significance data
+#  page load -> rent statistics data
+#  page load -> place/year availability data
+#  page load -> footer
+#  census tract value -> tract trends data
 #  
 # Dropdowns:
-#  year value -> place options
-#  place value -> year options
+#  year value, availability data -> place options
+#  place value, availability data -> year options
 #  place options, year options, map ClickData -> census tract options
 #  click data -> census tract value
+#  year value, year options -> base year options
+#  play years value, availability data -> play years disabled, base year disabled, play note
 #
 # Titles:
-#  place value, year value -> map title
+#  year value, play years value, masterfile data -> map title
 #  place value, census tract value -> plot title
 #
+# Summary:
+#  place value, year value, rent statistics data -> summary title, rent summary
+#  census tract value, masterfile data, tract trends data -> similar tracts title, similar tracts
+#
 # Graphs:
-#  place value, year value, census tract value -> map
+#  place value, year value, census tract value, base year value, play years value, availability data -> map
 #  place value, census tract value -> plot
 #
 # ----------------------------------- #
@@ -184,10 +257,7 @@ app.layout = dbc.Container([
 app.clientside_callback(
     """
     async function(selected_place) {
-        const url = `https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/data/masterfiles/${selected_place}_masterfile.json`;
-        const response = await fetch(url);
-        const data = await response.json();
-        return data;
+        return await window.contractRents.fetchData(`data/masterfiles/${selected_place}_masterfile.json`);
     }
     """,
     Output('MASTERFILE', 'data'),
@@ -198,16 +268,77 @@ app.clientside_callback(
 app.clientside_callback(
     """
     async function(selected_year) {
-        const url = `https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/data/lat_lon_center_points/${selected_year}_latlon_center_points.json`;
-        const response = await fetch(url);
-        const data = await response.json();
-        return data;
+        return await window.contractRents.fetchData(`data/lat_lon_center_points/${selected_year}_latlon_center_points.json`);
     }
     """,
     Output('LAT-LON', 'data'),
     Input('year-dropdown', 'value')
 )
 
+# Years against which tract rents increased significantly
+app.clientside_callback(
+    """
+    async function(selected_year) {
+        return await window.contractRents.fetchData(`data/significance/${selected_year}_significance.json`);
+    }
+    """,
+    Output('SIGNIFICANCE', 'data'),
+    Input('year-dropdown', 'value')
+)
+
+# Place and county rent statistics
+app.clientside_callback(
+    """
+    async function(id) {
+        return await window.contractRents.fetchData('data/rent_statistics.json');
+    }
+    """,
+    Output('STATISTICS', 'data'),
+    Input('STATISTICS', 'id')
+)
+
+# Place/year availability
+app.clientside_callback(
+    """
+    async function(id) {
+        return await window.contractRents.fetchData('data/availability.json');
+    }
+    """,
+    Output('AVAILABILITY', 'data'),
+    Input('AVAILABILITY', 'id')
+)
+
+# Tract rent trends and similar tracts (fetched once a tract is selected)
+app.clientside_callback(
+    """
+    async function(selected_tract) {
+        if (selected_tract == undefined){
+            return dash_clientside.no_update;
+        }
+        return await window.contractRents.fetchData('data/tract_trends.json');
+    }
+    """,
+    Output('TRENDS', 'data'),
+    Input('census-tract-dropdown', 'value')
+)
+
+# Footer
+app.clientside_callback(
+    """
+    async function(id) {
+        // Served by the app itself, so offline and static-export builds do not depend on GitHub
+        const response = await fetch(window.contractRents.assetUrl('footer.md'));
+        if (!response.ok){
+            return window.dash_clientside.no_update;
+        }
+        const footer = await response.text();
+        return footer.replace('{year}', new Date().getFullYear());
+    }
+    """,
+    Output('footer', 'markdownStr'),
+    Input('footer', 'id')
+)
+
 
 # -- -- -- --
 # Dropdowns
@@ -216,26 +347,44 @@ app.clientside_callback(
 # Place dropdown options
 app.clientside_callback(
     """
-    function(selected_year, YEAR_PLACE_OPTIONS) {
-        return YEAR_PLACE_OPTIONS[selected_year]
+    function(selected_year, AVAILABILITY) {
+        if (!AVAILABILITY){
+            return window.dash_clientside.no_update;
+        }
+        const bit = 1 << (selected_year - AVAILABILITY['BASE_YEAR']);
+        return AVAILABILITY['PLACES'].map(([CITY, ABBREV_NAME, YEARS]) => window.contractRents.option(CITY, ABBREV_NAME, !(YEARS & bit)));
     }
     """,
     Output('place-dropdown', 'options'),
     [Input('year-dropdown', 'value'),
-     Input('YEAR_PLACE_OPTIONS', 'data')
+     Input('AVAILABILITY', 'data')
     ]
 )
 
 # Year dropdown options
 app.clientside_callback(
     """
-    function(selected_place, PLACE_YEAR_OPTIONS) {
-        return PLACE_YEAR_OPTIONS[selected_place]
+    function(selected_place, AVAILABILITY) {
+        if (!AVAILABILITY){
+            return window.dash_clientside.no_update;
+        }
+        const BASE_YEAR = AVAILABILITY['BASE_YEAR'];
+        const ALL_YEARS = AVAILABILITY['PLACES'].reduce((all_years, [CITY, ABBREV_NAME, YEARS]) => all_years | YEARS, 0);
+        const place = AVAILABILITY['PLACES'].find(([CITY, ABBREV_NAME, YEARS]) => ABBREV_NAME === selected_place);
+        const place_years = (place == undefined) ? 0 : place[2];
+
+        var year_options = [];
+        for (let i = 0; (ALL_YEARS >> i) > 0; i++) {
+            if (ALL_YEARS & (1 << i)) {
+                year_options.push(window.contractRents.option(BASE_YEAR + i, BASE_YEAR + i, !(place_years & (1 << i))));
+            }
+        }
+        return year_options;
     }
     """,
     Output('year-dropdown', 'options'),
     [Input('place-dropdown', 'value'),
-     Input('PLACE_YEAR_OPTIONS', 'data')
+     Input('AVAILABILITY', 'data')
     ]
 )
 
@@ -261,13 +410,56 @@ app.clientside_callback(
 app.clientside_callback(
     """
     function(clickData) {
-        return clickData['points']['0']['customdata']
+        return clickData['points']['0']['customdata'][0]
     }
     """,
     Output('census-tract-dropdown', 'value'),
     Input('chloropleth_map', 'clickData')
 )
 
+# Base year options
+app.clientside_callback(
+    """
+    function(selected_year, year_options) {
+        return year_options.filter(item => item['value'] < selected_year && !item['disabled']);
+    }
+    """,
+    Output('base-year-dropdown', 'options'),
+    [Input('year-dropdown', 'value'),
+     Input('year-dropdown', 'options')
+    ]
+)
+
+# Play years availability (the published snapshot must hold the geometries of every tract vintage), and the base
+# year while playing (significant increases are not marked on the animated map)
+app.clientside_callback(
+    """
+    function(play_years, AVAILABILITY) {
+        if (!AVAILABILITY){
+            return window.dash_clientside.no_update;
+        }
+        const files = window.contractRents.files;
+        const vintages = AVAILABILITY['VINTAGES'] || [];
+        const unavailable = vintages.length == 0 || (Object.keys(files).length > 0
+            && vintages.some(years => !(`data/vintage_geometries/${years[0]}_geometry.geojson` in files)));
+        if (unavailable){
+            return [true, false, 'Playing years is unavailable until the tract geometries of every vintage are published.'];
+        }
+        if (play_years){
+            return [false, true, 'Significant increases are not marked while playing years.'];
+        }
+        return [false, false, ''];
+    }
+    """,
+    [Output('play-years', 'disabled'),
+     Output('base-year-dropdown', 'disabled'),
+     Output('play-note', 'children')
+    ],
+    [Input('play-years', 'value'),
+     Input('AVAILABILITY', 'data')
+    ]
+)
+
 
 
 # -- -- -- --
@@ -278,7 +470,11 @@ app.clientside_callback(
 # Map title
 app.clientside_callback(
     """
-    function(selected_year, MASTERFILE) {
+    function(selected_year, play_years, MASTERFILE) {
+        if (play_years){
+            const years = MASTERFILE.map(({YEAR}) => YEAR);
+            return [MASTERFILE[0]['CITY'], `${Math.min(...years)} to ${Math.max(...years)}`];
+        }
         var my_array = MASTERFILE.filter(item => item['YEAR'] === selected_year);
         var city_array = my_array.map(({CITY}) => CITY);
         var selected_city = city_array[0];
@@ -289,6 +485,7 @@ app.clientside_callback(
      Output('map-title2', 'children')
     ],
     [Input('year-dropdown', 'value'),
+     Input('play-years', 'value'),
      Input('MASTERFILE', 'data')
     ]
 )
@@ -313,6 +510,101 @@ app.clientside_callback(
 )
 
 
+# -- -- -- --
+# Summary
+# -- -- -- --
+
+# Rent summary
+app.clientside_callback(
+    """
+    function(selected_place, selected_year, STATISTICS) {
+        if (!STATISTICS){
+            return window.dash_clientside.no_update;
+        }
+        const col = Object.fromEntries(STATISTICS['columns'].map((name, i) => [name, i]));
+        const find = (place) => STATISTICS['data'].find(row => row[col['ABBREV_NAME']] === place && row[col['YEAR']] === selected_year);
+        const place_row = find(selected_place);
+        const county_row = find('LosAngelesCounty');
+
+        const dollars = (v) => (v == null) ? 'Not Available' : '$' + Math.round(v).toLocaleString('en-US');
+        const change = (v, moe) => (v == null) ? 'Not Available' : (v >= 0 ? '+' : '-') + dollars(Math.abs(v)) + (moe == null ? '' : ' ± ' + dollars(moe));
+        const share = (v) => (v == null) ? 'Not Available' : (100 * v).toFixed(1) + '%';
+        const cells = (row) => (row == undefined) ? Array(7).fill('Not Available') : [
+            `${row[col['REPORTED']]} of ${row[col['TRACTS']]}`,
+            dollars(row[col['MEDIAN']]),
+            `${dollars(row[col['P25']])} to ${dollars(row[col['P75']])}`,
+            share(row[col['SHARE_TOP_CODED']]),
+            share(row[col['SHARE_ABOVE_2000']]),
+            change(row[col['YOY_MEDIAN_CHANGE']], null),
+            change(row[col['YOY_MEAN_CHANGE']], row[col['YOY_MEAN_CHANGE_MOE']])
+        ];
+        const labels = ['Census tracts with a median contract rent', 'Median of tract median contract rents', '25th to 75th percentile of tract median contract rents',
+                        'Share of tracts top-coded by the ACS (left out of the median, percentiles and mean)', 'Share of tracts with a median contract rent above $2,000', 'Change in the median from the prior year', 'Change in the mean from the prior year (90% MOE)'];
+        const place_cells = cells(place_row);
+        const county_cells = cells(county_row);
+        const city = (place_row == undefined) ? selected_place : place_row[col['CITY']];
+
+        var table = `| | **${city}** | **Los Angeles County** |\n|:--|--:|--:|\n`;
+        labels.forEach((label, i) => { table += `| ${label} | ${place_cells[i]} | ${county_cells[i]} |\n`; });
+        return [city, selected_year, table];
+    }
+    """,
+    [Output('summary-title1', 'children'),
+     Output('summary-title2', 'children'),
+     Output('rent-summary', 'children')
+    ],
+    [Input('place-dropdown', 'value'),
+     Input('year-dropdown', 'value'),
+     Input('STATISTICS', 'data')
+    ]
+)
+
+
+# Similar tracts
+app.clientside_callback(
+    """
+    function(selected_tract, MASTERFILE, TRENDS) {
+        if (selected_tract == undefined){
+            return ['a tract', 'Please click on a tract.'];
+        }
+        // The tract dropdown may still hold a tract of the previous place until its options are updated
+        const tract = (MASTERFILE || []).find(item => item['TRACT'] == selected_tract);
+        if (tract == undefined){
+            return [dash_clientside.no_update, dash_clientside.no_update];
+        }
+        const title = `${selected_tract}, ${MASTERFILE[0]['CITY']}`;
+        if (TRENDS == undefined){
+            return [title, dash_clientside.no_update];
+        }
+
+        const col = Object.fromEntries(TRENDS['COLUMNS'].map((name, i) => [name, i]));
+        const row = TRENDS['TRACTS'][String(tract['GEO_ID'])];
+        if (row == undefined){
+            return [title, 'This tract has too few consecutive reported years to compare its rent trend.'];
+        }
+
+        const percent = (v) => (100 * v).toFixed(1) + '%';
+        const points = (v) => (v >= 0 ? '+' : '') + (100 * v).toFixed(1) + ' pts';
+        const cells = (row) => `${row[col['TRACT']]} | ${row[col['CITY']]} | ${percent(row[col['CAGR']])} | ${percent(row[col['VOLATILITY']])} | ${points(row[col['ACCELERATION']])}`;
+
+        var table = '| Census tract | Place | Annual growth | Volatility | Acceleration |\n|:--|:--|--:|--:|--:|\n';
+        table += `| **${cells(row).split(' | ').join('** | **')}** |\n`;
+        row[col['SIMILAR']].forEach(GEO_ID => { table += `| ${cells(TRENDS['TRACTS'][GEO_ID])} |\n`; });
+        table += '\nAnnual growth is the compound annual growth rate of the median contract rent between the first and last reported years; '
+               + 'volatility is the standard deviation of its year-over-year changes; acceleration is the change in its average yearly growth over the last three years.';
+        return [title, table];
+    }
+    """,
+    [Output('similar-title', 'children'),
+     Output('similar-tracts', 'children')
+    ],
+    [Input('census-tract-dropdown', 'value'),
+     Input('MASTERFILE', 'data'),
+     Input('TRENDS', 'data')
+    ]
+)
+
+
 # -- -- --
 # Graphs
 # -- -- --
@@ -320,25 +612,122 @@ app.clientside_callback(
 # Choropleth map
 app.clientside_callback(
     """
-    function(selected_place, selected_year, selected_tract, MASTERFILE, LAT_LON){
-        var my_array = MASTERFILE.filter(item => item['YEAR'] === selected_year);
-        
-        var url_path = `https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/data/mastergeometries/${selected_year}_mastergeometry.geojson`;
-        
-        var locations_array = my_array.map( ({GEO_ID}) => GEO_ID);
-        var z_array = my_array.map( ({B25058_001E}) => B25058_001E);
-        var customdata_array = my_array.map( ({TRACT}) => TRACT);
-        
+    function(selected_place, selected_year, selected_tract, base_year, play_years, MASTERFILE, LAT_LON, SIGNIFICANCE, AVAILABILITY){
         var lat_lon_array = LAT_LON.filter(item => item['ABBREV_NAME'] === selected_place);
         const lon_center = lat_lon_array[0]['LON_CENTER'];
         const lat_center = lat_lon_array[0]['LAT_CENTER'];
+        const city = MASTERFILE.length ? MASTERFILE[0]['CITY'] : '';
+
+        // Hover content is filled in by Plotly from the customdata (tract and display strings); the city is the same for every tract
+        var template = "<b style='font-size:16px;'>%{customdata[0]}</b><br>" + city + "<br><br>"
+            + "Median Contract Rent: <br><b style='color:#800000; font-size:14px;'>%{customdata[1]}</b> <br><br>"
+            + "25th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>%{customdata[2]}</b> <br><br>"
+            + "75th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>%{customdata[3]}</b> <br><br><extra></extra>";
+
+        var layout = {
+            'autosize': true,
+            'hoverlabel': {'align': 'left'},
+            'map': {'center': {'lat': lat_center, 'lon': lon_center}, 'style': 'streets', 'zoom': 10},
+            'margin': {'b': 0, 'l': 0, 'r': 0, 't': 0},
+            'paper_bgcolor': '#FEF9F3',
+            'plot_bgcolor': '#FEF9F3',
+        };
+
+        // Without any rows (e.g. a place with no data) there are no frames to play, so the static figure is returned
+        if (play_years && MASTERFILE.length){
+            if (!AVAILABILITY){
+                return window.dash_clientside.no_update;
+            }
+            // One frame per year from a dense year x tract matrix of each tract vintage (the tracts of the decennial census,
+            // as grouped by the ETL). Each vintage's geometry is fetched once by Plotly and reused by every frame of its years.
+            // The selected tract is outlined in every frame; significant increases are not marked while playing.
+            const years = [...new Set(MASTERFILE.map(({YEAR}) => YEAR))].sort((a, b) => a - b);
+            var vintage_of = {};
+            (AVAILABILITY['VINTAGES'] || []).forEach(vintage_years => vintage_years.forEach(year => { vintage_of[year] = vintage_years[0]; }));
+            const vintage = (year) => vintage_of[year] || year;
+            var vintages = {};
+            MASTERFILE.forEach(item => {
+                const v = vintages[vintage(item['YEAR'])] = vintages[vintage(item['YEAR'])] || {'locations': [], 'column': {}, 'tracts': []};
+                if (!(item['GEO_ID'] in v['column'])){
+                    v['column'][item['GEO_ID']] = v['locations'].length;
+                    v['locations'].push(item['GEO_ID']);
+                    v['tracts'].push(item['TRACT']);
+                }
+            });
+
+            var z_matrix = years.map(year => new Array(vintages[vintage(year)]['locations'].length).fill(null));
+            var customdata_matrix = years.map(year => vintages[vintage(year)]['tracts'].map(tract => [tract, 'Not Available!', 'Not Available!', 'Not Available!']));
+            MASTERFILE.forEach(item => {
+                const i = years.indexOf(item['YEAR']);
+                const j = vintages[vintage(item['YEAR'])]['column'][item['GEO_ID']];
+                z_matrix[i][j] = item['B25058_001E'];
+                customdata_matrix[i][j] = [item['TRACT'], item['Median'], item['25th'], item['75th']];
+            });
 
-        var strings = my_array.map(function(item) {
-            return "<b style='font-size:16px;'>" + item['TRACT'] + "</b><br>" + item['CITY'] + "<br><br>"
-            + "Median Contract Rent: <br><b style='color:#800000; font-size:14px;'>" + item['Median'] + "</b> <br><br>"
-            + "25th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>" + item['25th'] + "</b> <br><br>"
-            + "75th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>" + item['75th'] + "</b> <br><br><extra></extra>";
+            var frames = years.map((year, i) => {
+                const geojson = window.contractRents.url(`data/vintage_geometries/${vintage(year)}_geometry.geojson`);
+                var frame_data = [{
+                    'geojson': geojson,
+                    'locations': vintages[vintage(year)]['locations'],
+                    'z': z_matrix[i],
+                    'customdata': customdata_matrix[i],
+                }];
+                if (selected_tract != undefined){
+                    const aux_locations_array = MASTERFILE.filter(item => item['YEAR'] === year && item['TRACT'] === selected_tract).map(({GEO_ID}) => GEO_ID);
+                    frame_data.push({'geojson': geojson, 'locations': aux_locations_array, 'z': aux_locations_array.map(() => 1)});
+                }
+                return {'name': String(year), 'data': frame_data, 'traces': frame_data.map((trace, j) => j)};
             });
+
+            var data = [Object.assign({
+                'type': 'choroplethmap',
+                'featureidkey': 'properties.GEO_ID',
+                'colorscale': 'YlOrRd',
+                'reversescale': true,
+                'zmin': 0, 'zmax': 3500,
+                'marker': {'line': {'color': '#020403', 'width': 1.75}, 'opacity': 0.7},
+                'colorbar': {'outlinewidth': 2,
+                             'ticklabelposition': 'outside bottom',
+                             'tickprefix': '$',
+                             'title': {'font': {'color': '#020403', 'weight': 500}, 'text': 'Median Contract<br>Rents ($)'}},
+                'hoverlabel': {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}},
+                'hovertemplate': template
+            }, frames[0]['data'][0])];
+            if (selected_tract != undefined){
+                data.push(Object.assign({
+                    'type': 'choroplethmap',
+                    'featureidkey': 'properties.GEO_ID',
+                    'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+                    'showscale': false,
+                    'zmin': 0, 'zmax': 1,
+                    'marker': {'line': {'color': '#04D9FF', 'width': 4}},
+                    'hoverinfo': 'skip',
+                }, frames[0]['data'][1]));
+            }
+
+            const animation = {'frame': {'duration': 800, 'redraw': true}, 'transition': {'duration': 0}, 'mode': 'immediate'};
+            layout['updatemenus'] = [{
+                'type': 'buttons', 'showactive': false, 'direction': 'left',
+                'x': 0.01, 'y': 0.01, 'xanchor': 'left', 'yanchor': 'bottom',
+                'buttons': [{'label': 'Play', 'method': 'animate', 'args': [null, Object.assign({'fromcurrent': true}, animation)]},
+                            {'label': 'Pause', 'method': 'animate', 'args': [[null], animation]}]
+            }];
+            layout['sliders'] = [{
+                'active': 0, 'x': 0.2, 'len': 0.75, 'y': 0.01, 'yanchor': 'bottom',
+                'bgcolor': '#FEF9F3', 'currentvalue': {'prefix': 'Year: ', 'font': {'color': '#020403'}},
+                'steps': years.map(year => ({'label': String(year), 'method': 'animate', 'args': [[String(year)], animation]}))
+            }];
+
+            return {'data': data, 'layout': layout, 'frames': frames};
+        }
+
+        var my_array = MASTERFILE.filter(item => item['YEAR'] === selected_year);
+        
+        var url_path = window.contractRents.url(`data/mastergeometries/${selected_year}_mastergeometry.geojson`);
+        
+        var locations_array = my_array.map( ({GEO_ID}) => GEO_ID);
+        var z_array = my_array.map( ({B25058_001E}) => B25058_001E);
+        var customdata_array = my_array.map(item => [item['TRACT'], item['Median'], item['25th'], item['75th']]);
     
     
     
@@ -353,23 +742,13 @@ app.clientside_callback(
             'z': z_array,
             'zmin': 0, 'zmax': 3500,
             'marker': {'line': {'color': '#020403', 'width': 1.75}, 'opacity': 0.7},
-            'text': strings,
             'colorbar': {'outlinewidth': 2,
                          'ticklabelposition': 'outside bottom',
                          'tickprefix': '$',
                          'title': {'font': {'color': '#020403', 'weight': 500}, 'text': 'Median Contract<br>Rents ($)'}},
             'hoverlabel': {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}},
-            'hovertemplate': '%{text}'
+            'hovertemplate': template
         }];
-    
-        var layout = {
-            'autosize': true,
-            'hoverlabel': {'align': 'left'},
-            'map': {'center': {'lat': lat_center, 'lon': lon_center}, 'style': 'streets', 'zoom': 10},
-            'margin': {'b': 0, 'l': 0, 'r': 0, 't': 0},
-            'paper_bgcolor': '#FEF9F3',
-            'plot_bgcolor': '#FEF9F3',
-        };
         
         if (selected_tract != undefined){
             var aux_array = my_array.filter(item => item['TRACT'] === selected_tract);
@@ -392,6 +771,28 @@ app.clientside_callback(
             data.push(aux_data);
         }
 
+        if (base_year != undefined && base_year < selected_year && SIGNIFICANCE != undefined){
+            var sig_array = my_array.filter(item => (SIGNIFICANCE[String(item['GEO_ID'])] || []).includes(base_year));
+            var sig_locations_array = sig_array.map(({GEO_ID}) => GEO_ID);
+
+            var sig_data = {
+                'type': 'choroplethmap',
+                'name': `Significant increase since ${base_year}`,
+                'geojson': url_path,
+                'locations': sig_locations_array,
+                'featureidkey': 'properties.GEO_ID',
+                'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+                'showscale': false,
+                'showlegend': true,
+                'z': sig_locations_array.map(() => 1),
+                'zmin': 0, 'zmax': 1,
+                'marker': {'line': {'color': '#2A9D8F', 'width': 3}},
+                'hoverinfo': 'skip',
+            }
+            data.push(sig_data);
+            layout['legend'] = {'x': 0.01, 'y': 0.99, 'bgcolor': 'rgba(254,249,243,0.8)'};
+        }
+
         return {'data': data, 'layout': layout}
     }
     """,
@@ -399,8 +800,12 @@ app.clientside_callback(
     [Input('place-dropdown', 'value'),
      Input('year-dropdown', 'value'),
      Input('census-tract-dropdown', 'value'),
+     Input('base-year-dropdown', 'value'),
+     Input('play-years', 'value'),
      Input('MASTERFILE', 'data'),
      Input('LAT-LON', 'data'),
+     Input('SIGNIFICANCE', 'data'),
+     Input('AVAILABILITY', 'data'),
     ]
 )
 
@@ -417,20 +822,11 @@ app.clientside_callback(
             var y_lower_arr = my_array.map( ({B25057_001E}) => B25057_001E);
             var y_upper_arr = my_array.map( ({B25059_001E}) => B25059_001E);
     
-            var strings = my_array.map(function(item) {
-                return "<b style='font-size:16px;'>" + item['YEAR'] + "</b><br>" + item['TRACT'] + ", " + item['CITY'] + " <br><br>" +
-                "Median Contract Rent: <br><b style='color:#800000; font-size:14px;'>" + item['Median'] + "</b> <br><br><extra></extra>";
-            });
-
-            var upper_strings = my_array.map(function(item) {
-                return "<b style='font-size:16px;'>" + item['YEAR'] + "</b><br>" + item['TRACT'] + ", " + item['CITY'] + " <br><br>" +
-                "75th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>" + item['75th'] + "</b> <br><br><extra></extra>";
-            });
-
-            var lower_strings = my_array.map(function(item) {
-                return "<b style='font-size:16px;'>" + item['YEAR'] + "</b><br>" + item['TRACT'] + ", " + item['CITY'] + " <br><br>" +
-                "25th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>" + item['25th'] + "</b> <br><br><extra></extra>";
-            });
+            // Hover content is filled in by Plotly from the year and each trace's display strings; the tract and city are the same for every year
+            var header = "<b style='font-size:16px;'>%{x}</b><br>" + my_array[0]['TRACT'] + ", " + my_array[0]['CITY'] + " <br><br>";
+            var template = function(label, color) {
+                return header + label + ": <br><b style='color:" + color + "; font-size:14px;'>%{text}</b> <br><br><extra></extra>";
+            };
         
         
         
@@ -441,9 +837,9 @@ app.clientside_callback(
                 'mode': 'lines+markers',
                 'line': {'color': '#800000'},
                 'marker': {'size': 10, 'line': {'width': 2, 'color': '#F5FBFF'}},
-                'text': strings,
+                'text': my_array.map(item => item['Median']),
                 'hoverlabel': {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}},
-                'hovertemplate': '%{text}',
+                'hovertemplate': template('Median Contract Rent', '#800000'),
                 'showlegend': false,
                 'zorder': 1
             }, {'type': 'scatter',
@@ -452,9 +848,9 @@ app.clientside_callback(
                 'mode': 'lines',
                 'marker': {'color': '#83e6b5'},
                 'line': {'width': 0},
-                'text': upper_strings,
+                'text': my_array.map(item => item['75th']),
                 'hoverlabel': {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}},
-                'hovertemplate': '%{text}',
+                'hovertemplate': template('75th Percentile Contract Rent', '#B22222'),
                 'showlegend': false,
             }, {'type': 'scatter',
                 'x': x_array,
@@ -464,9 +860,9 @@ app.clientside_callback(
                 'fillcolor': 'rgba(153, 170, 187, 0.5)',
                 'marker': {'color': '#83e6b5'},
                 'line': {'width': 0},
-                'text': lower_strings,
+                'text': my_array.map(item => item['25th']),
                 'hoverlabel': {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}},
-                'hovertemplate': '%{text}',
+                'hovertemplate': template('25th Percentile Contract Rent', '#B22222'),
                 'showlegend': false,
             }];
         
@@ -499,4 +895,5 @@ app.clientside_callback(
 
 # Execute the app
 if __name__ == '__main__':
+    start_prewarm()
     app.run(debug=False)
@@ -0,0 +1,60 @@
+// Shared data access for the clientside callbacks: each data file is fetched once per page load and cached.
+window.contractRents = {
+    dataUrl: 'https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/',
+    _cache: {},
+
+    // Data version pinned for this page load: '?data_version=...' if given, else the current version named by
+    // data/manifest.json. Data files are fetched from the immutable, content-hashed objects of its manifest.
+    dataVersion: new URLSearchParams(window.location.search).get('data_version'),
+    files: {},
+    _manifest: null,
+
+    manifest: function() {
+        if (this._manifest == null) {
+            const version = this.dataVersion
+                ? Promise.resolve(this.dataVersion)
+                : fetch(this.dataUrl + 'data/manifest.json', {cache: 'no-cache'}).then(response => response.ok ? response.json() : {}).then(pointer => pointer['version']);
+            this._manifest = version
+                .then(version => version ? fetch(this.dataUrl + `data/manifests/${version}.json`).then(response => response.ok ? response.json() : {}) : {})
+                .catch(() => ({}))
+                .then(manifest => {
+                    this.dataVersion = manifest['version'] || this.dataVersion;
+                    this.files = manifest['files'] || {};
+                    return this.files;
+                });
+        }
+        return this._manifest;
+    },
+
+    // URL of a data file in the pinned version (or its plain path, for files outside the snapshots)
+    url: function(path) {
+        return this.dataUrl + (this.files[path] || path);
+    },
+
+    // URL of a file the app serves from its assets folder, under the app's path prefix (e.g. on GitHub Pages)
+    assetUrl: function(file) {
+        const config = document.getElementById('_dash-config');
+        const prefix = config ? JSON.parse(config.textContent)['requests_pathname_prefix'] : '/';
+        return `${prefix}assets/${file}`;
+    },
+
+    fetchData: function(path, as_text) {
+        if (!(path in this._cache)) {
+            this._cache[path] = this.manifest()
+                .then(() => fetch(this.url(path)))
+                .then(response => {
+                    if (!response.ok) { throw new Error(`${response.status} ${path}`); }
+                    return as_text ? response.text() : response.json();
+                })
+                .catch(error => { delete this._cache[path]; throw error; });
+        }
+        return this._cache[path];
+    },
+
+    // Dropdown option, as rendered by the place and year dropdowns
+    option: function(label, value, disabled) {
+        return {'label': {'namespace': 'dash_html_components', 'type': 'Span', 'props': {'children': [label], 'style': {'color': '#151E3D'}}},
+                'value': value,
+                'disabled': disabled};
+    }
+};
@@ -0,0 +1,180 @@
+"""
+Synthetic fixtures for the benchmark suite, sized to the real data (140 places x 14 years x ~2,500 tracts),
+and a local fake Census server that serves them in place of the Census Bureau API and TIGER/Line files.
+
+Run as a script to start the fake Census server:
+
+    python benchmarks/fixtures.py --port 8765
+"""
+import pandas as pd
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
+from functools import cache
+from aiohttp import web
+import os, io, re, json, zipfile, argparse, tempfile
+
+N_PLACES = 140
+N_TRACTS = 2500
+YEARS = list(range(2010, 2024))
+ACS_CODES = ['B25057', 'B25058', 'B25059']
+SENTINELS = ['-666666666', '-999999999', '-222222222']
+
+
+# ---- Places and tracts ---- #
+@cache
+def fixture_places() -> pd.DataFrame:
+    """
+    Return the synthetic places, with one large place (as with the City of Los Angeles) and 139 smaller ones.
+
+    :return: Data with 'FIPS', 'NAME', 'ABBREV_NAME' and 'N_TRACTS' columns.
+    :rtype: pd.DataFrame
+    """
+    rng = np.random.default_rng(0)
+    sizes = np.maximum(1, np.round(rng.dirichlet(np.ones(N_PLACES - 1)) * (N_TRACTS - 1000))).astype(int)
+    names = ['Place ' + ''.join(chr(65 + (i // 26 ** k) % 26) for k in range(2)) for i in range(N_PLACES)]
+    return pd.DataFrame({'FIPS': [f'06{10000 + 300 * i:05d}' for i in range(N_PLACES)],
+                         'NAME': names,
+                         'ABBREV_NAME': [name.replace(' ', '') for name in names],
+                         'N_TRACTS': np.concatenate([[1000], sizes])})
+
+
+@cache
+def fixture_tracts() -> pd.DataFrame:
+    """
+    Return the synthetic census tracts: a grid of square tracts, assigned to places in contiguous runs.
+
+    :return: Data with 'GEO_ID', 'TRACT', 'PLACE', 'LAT' and 'LON' columns.
+    :rtype: pd.DataFrame
+    """
+    places_df = fixture_places()
+    n_tracts = places_df['N_TRACTS'].sum()
+    side = int(np.ceil(np.sqrt(n_tracts)))
+    tract_numbers = 101000 + np.arange(n_tracts) * 3
+    return pd.DataFrame({'GEO_ID': [f'06037{n:06d}' for n in tract_numbers],
+                         'TRACT': [f'Census Tract {n // 100}.{n % 100:02d}' for n in tract_numbers],
+                         'PLACE': np.repeat(np.arange(len(places_df)), places_df['N_TRACTS']),
+                         'LAT': 33.7 + (np.arange(n_tracts) // side) * 0.01 + 0.005,
+                         'LON': -118.9 + (np.arange(n_tracts) % side) * 0.01 + 0.005})
+
+
+def places_txt() -> str:
+    """
+    Return the synthetic place list in the format of the Census Bureau's 'st06_ca_place2020.txt'.
+    """
+    places_df = fixture_places()
+    rows = ['STATEFP|STATE|PLACEFP|PLACENS|PLACENAME|TYPE|CLASSFP|FUNCSTAT|COUNTIES']
+    for FIPS, NAME in zip(places_df['FIPS'], places_df['NAME']):
+        rows.append(f'06|CA|{FIPS[2:]}|00000000|{NAME} city|INCORPORATED PLACE|C1|A|Los Angeles County')
+    return '\n'.join(rows) + '\n'
+
+
+# ---- ACS tables ---- #
+def census_table(ACS_code: str, year: int, FIPS: str) -> list[list]:
+    """
+    Return the synthetic Census API response for one ACS table, year and place.
+
+    :param ACS_code: ACS code of the table.
+    :type ACS_code: str
+
+    :param year: Data year.
+    :type year: int
+
+    :param FIPS: Place FIPS code.
+    :type FIPS: str
+
+    :return: Header row followed by one row per tract, as the Census API returns them.
+    :rtype: list[list]
+    """
+    places_df = fixture_places()
+    tracts_df = fixture_tracts()
+    place = int(np.flatnonzero(places_df['FIPS'] == FIPS)[0])
+    tracts_df = tracts_df[tracts_df['PLACE'] == place]
+
+    rng = np.random.default_rng([ACS_CODES.index(ACS_code), year, place])
+    estimates = rng.integers(500, 3600, len(tracts_df)).astype(str).astype(object)
+    estimates[rng.random(len(tracts_df)) < 0.03] = '2001' if year <= 2014 else '3501'
+    missing = rng.random(len(tracts_df)) < 0.03
+    estimates[missing] = rng.choice(SENTINELS, missing.sum())
+    moes = rng.integers(20, 900, len(tracts_df)).astype(str).astype(object)
+    moes[missing] = '-555555555'
+
+    header = ['GEO_ID', 'NAME', f'{ACS_code}_001E', f'{ACS_code}_001EA', f'{ACS_code}_001M', f'{ACS_code}_001MA', 'ucgid']
+    rows = [[f'1400000US{GEO_ID}', f'{TRACT}; Los Angeles County; California', E, None, M, None, f'1400000US{GEO_ID}']
+            for GEO_ID, TRACT, E, M in zip(tracts_df['GEO_ID'], tracts_df['TRACT'], estimates, moes)]
+    return [header] + rows
+
+
+# ---- TIGER/Line shapefiles ---- #
+@cache
+def tiger_zip(vintage: int) -> bytes:
+    """
+    Return a zipped TIGER/Line-style tract shapefile covering the synthetic tracts.
+
+    :param vintage: 2010 for the 2010 TIGER/Line column names (suffixed '10'), anything else for later years.
+    :type vintage: int
+
+    :return: Zipped shapefile.
+    :rtype: bytes
+    """
+    tracts_df = fixture_tracts()
+    suffix = '10' if vintage == 2010 else ''
+    gdf = gpd.GeoDataFrame({f'STATEFP{suffix}': '06',
+                            f'COUNTYFP{suffix}': '037',
+                            f'TRACTCE{suffix}': tracts_df['GEO_ID'].str[5:],
+                            f'GEOID{suffix}': tracts_df['GEO_ID'],
+                            f'NAMELSAD{suffix}': tracts_df['TRACT'],
+                            f'INTPTLAT{suffix}': [f'+{lat:.7f}' for lat in tracts_df['LAT']],
+                            f'INTPTLON{suffix}': [f'{lon:.7f}' for lon in tracts_df['LON']]},
+                           geometry = [box(lon - 0.005, lat - 0.005, lon + 0.005, lat + 0.005) for lat, lon in zip(tracts_df['LAT'], tracts_df['LON'])],
+                           crs = 'EPSG:4269')
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        gdf.to_file(f'{tmp_folder}/tracts.shp')
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as zip_file:
+            for file in os.listdir(tmp_folder):
+                zip_file.write(f'{tmp_folder}/{file}', file)
+    return buffer.getvalue()
+
+
+# ---- Fake Census server ---- #
+async def _acs_handler(request: web.Request) -> web.Response:
+    year = int(request.match_info['year'])
+    ACS_code = re.fullmatch(r'group\((\w+)\)', request.query['get']).group(1)
+    FIPS = re.fullmatch(r'pseudo\(1600000US(\d+)\$1400000\)', request.query['ucgid']).group(1)
+    if year not in YEARS or ACS_code not in ACS_CODES:
+        return web.Response(status = 404)
+    return web.Response(text = json.dumps(census_table(ACS_code, year, FIPS)), content_type = 'application/json')
+
+
+async def _tiger_handler(request: web.Request) -> web.Response:
+    year = int(request.match_info['year'])
+    if year not in YEARS:
+        return web.Response(status = 404)
+    return web.Response(body = tiger_zip(2010 if year == 2010 else 2020), content_type = 'application/zip')
+
+
+async def _places_handler(request: web.Request) -> web.Response:
+    return web.Response(text = places_txt())
+
+
+def fake_census_app() -> web.Application:
+    """
+    Return the fake Census server, with the Census API under '/data', TIGER/Line under '/geo/tiger' and the
+    place list under '/places.txt'.
+    """
+    app = web.Application()
+    app.add_routes([web.get('/data/{year}/acs/acs5', _acs_handler),
+                    web.get('/geo/tiger/TIGER{year}/TRACT/2010/tl_2010_06_tract10.zip', _tiger_handler),
+                    web.get('/geo/tiger/TIGER{year}/TRACT/tl_{name}_06_tract.zip', _tiger_handler),
+                    web.get('/places.txt', _places_handler)])
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Serve the synthetic fixtures as a fake Census server.')
+    parser.add_argument('--port', type = int, default = 8765)
+    args = parser.parse_args()
+
+    web.run_app(fake_census_app(), host = '127.0.0.1', port = args.port, print = None)
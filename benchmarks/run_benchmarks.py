@@ -0,0 +1,208 @@
+"""
+Benchmark the ETL and app startup hot paths against synthetic fixtures and a local fake Census server.
+
+Each benchmark runs in its own process, so its peak RSS is measured on its own. Results are compared against
+'benchmarks/baseline.json', and the run fails if any benchmark is slower, or uses more memory, than the baseline
+by more than the tolerance.
+
+    python benchmarks/run_benchmarks.py                    # Run and compare against the baseline
+    python benchmarks/run_benchmarks.py --update-baseline  # Run and store the results as the new baseline
+"""
+from functools import reduce
+import os, sys, json, time, shutil, socket, argparse, tempfile, traceback, subprocess, urllib.request
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+baseline_file_path = f'{repo_folder}/benchmarks/baseline.json'
+
+sys.path.insert(0, f'{repo_folder}/benchmarks')
+from fixtures import ACS_CODES, YEARS, N_PLACES
+
+
+# ---- Measurement ---- #
+def _measure(func) -> dict:
+    """
+    Run `func` in a forked process and return its wall time, peak RSS and the count of items it processed.
+
+    :param func: Function returning the count of items processed (e.g. requests or rows).
+    :type func: Callable[[], int]
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The child must never return into the caller (and its clean-up), whatever `func` raises
+        try:
+            os.close(read_fd)
+            start = time.perf_counter()
+            items = func()
+            seconds = time.perf_counter() - start
+            with os.fdopen(write_fd, 'w') as pipe:
+                json.dump({'seconds': seconds, 'items': items}, pipe)
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        output = pipe.read()
+    _, status, rusage = os.wait4(pid, 0)
+    if status != 0:
+        raise RuntimeError(f'Benchmark {func.__name__} failed with exit code {os.waitstatus_to_exitcode(status)} '
+                           '(see its traceback above).')
+    return dict(json.loads(output), peak_rss_mb = rusage.ru_maxrss / 1024)
+
+
+def _measure_import(module: str, cwd: str) -> dict:
+    """
+    Time a cold import of `module` in a fresh interpreter, from `cwd`.
+    """
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    process = subprocess.Popen([sys.executable, '-c', code], cwd = cwd, stdout = subprocess.PIPE, text = True,
+                               env = dict(os.environ, PYTHONPATH = repo_folder))
+    output = process.stdout.read()
+    _, status, rusage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise RuntimeError(f'Importing {module} exited with status {status}.')
+    return {'seconds': float(output), 'items': 1, 'peak_rss_mb': rusage.ru_maxrss / 1024}
+
+
+# ---- Fake Census server ---- #
+def _start_fake_census() -> tuple[subprocess.Popen, str]:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, f'{repo_folder}/benchmarks/fixtures.py', '--port', str(port)])
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'{url}/places.txt')
+            return process, url
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('The fake Census server did not start.')
+
+
+# ---- Benchmarks ---- #
+def run_benchmarks() -> dict:
+    """
+    Run every benchmark in order (later stages use the outputs of earlier ones) and return their results.
+    """
+    server, url = _start_fake_census()
+    fixture_folder = tempfile.mkdtemp(prefix = 'benchmarks_')
+    cwd = os.getcwd()
+    try:
+        os.chdir(fixture_folder)
+        sys.path.insert(0, f'{repo_folder}/utils')
+        import util_func as uf
+        import pandas as pd
+
+        uf.census_api_url = f'{url}/data'
+        uf.census_tiger_url = f'{url}/geo/tiger'
+        uf.txt_file_url = f'{url}/places.txt'
+        uf.LA_cities_index()
+
+        def extraction():
+            uf.ACS_data_extraction('B25058', 'KEY', final_year = max(YEARS))
+            return N_PLACES * len(YEARS)
+
+        def merged_masterfile():
+            df_list = []
+            for ACS_code in ACS_CODES:
+                folder = f'{uf.masterfiles_folder}ACS_Codes/{ACS_code}/'
+                df_list.append( pd.concat([pd.read_csv(f'{folder}{file}') for file in os.listdir(folder)], ignore_index = True) )
+            return reduce(lambda left, right: pd.merge(left, right, on = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME'], how = 'left'),
+                          df_list)
+
+        def segmentation():
+            df = merged_masterfile()
+            uf.write_masterfiles(df)
+            return len(df)
+
+        def masterfile():
+            uf.masterfile_creation(ACS_CODES, 'KEY')
+            return len(merged_masterfile())
+
+        def mastergeometry():
+            uf.mastergeometry_creation()
+            return len(YEARS)
+
+        def center_points():
+            uf.lat_lon_center_points()
+            return len(YEARS)
+
+        results = {}
+        results['ACS_data_extraction'] = dict(_measure(extraction), unit = 'requests')
+
+        # The remaining ACS tables are extracted outside of the measurements
+        for ACS_code in ACS_CODES:
+            uf.ACS_data_extraction(ACS_code, 'KEY', final_year = max(YEARS))
+
+        results['write_masterfiles'] = dict(_measure(segmentation), unit = 'rows')
+        results['masterfile_creation'] = dict(_measure(masterfile), unit = 'rows')
+        results['mastergeometry_creation'] = dict(_measure(mastergeometry), unit = 'years')
+        results['lat_lon_center_points'] = dict(_measure(center_points), unit = 'years')
+        results['utils.app_setup import'] = dict(_measure_import('utils.app_setup', fixture_folder), unit = 'imports')
+    finally:
+        os.chdir(cwd)
+        server.kill()
+        shutil.rmtree(fixture_folder, ignore_errors = True)
+
+    for result in results.values():
+        result['throughput'] = result['items'] / result['seconds']
+    return results
+
+
+# ---- Report ---- #
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Return a message for each benchmark whose time or peak RSS exceeds its baseline by more than `tolerance`.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ['seconds', 'peak_rss_mb']:
+            if result[metric] > baseline[name][metric] * (1 + tolerance):
+                regressions.append(f'{name}: {metric} {result[metric]:.2f} > baseline {baseline[name][metric]:.2f}')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmark the ETL and app startup hot paths.')
+    parser.add_argument('--update-baseline', action = 'store_true', help = 'Store the results as the new baseline.')
+    parser.add_argument('--tolerance', type = float, default = 0.25, help = 'Allowed relative slowdown or memory growth. Default 0.25.')
+    parser.add_argument('--output', help = 'Optional path to write the results to, as JSON.')
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    baseline = {}
+    if os.path.exists(baseline_file_path):
+        with open(baseline_file_path) as jsonfile:
+            baseline = json.load(jsonfile)
+
+    print(f"{'Benchmark':<26}{'Seconds':>10}{'Baseline':>10}{'Throughput':>22}{'Peak RSS (MB)':>16}")
+    for name, result in results.items():
+        baseline_seconds = f"{baseline[name]['seconds']:.2f}" if name in baseline else '-'
+        throughput = f"{result['throughput']:,.1f} {result['unit']}/s"
+        print(f"{name:<26}{result['seconds']:>10.2f}{baseline_seconds:>10}{throughput:>22}{result['peak_rss_mb']:>16.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent = 2)
+
+    if args.update_baseline:
+        with open(baseline_file_path, 'w') as jsonfile:
+            json.dump(results, jsonfile, indent = 2)
+        sys.exit(0)
+
+    # A benchmark without a baseline cannot be checked, so it fails rather than passing unchecked
+    missing = [name for name in results if name not in baseline]
+    for name in missing:
+        print(f'MISSING BASELINE {name}: store one with `make benchmark_baseline`')
+
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    sys.exit(1 if regressions or missing else 0)
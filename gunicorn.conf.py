@@ -0,0 +1,17 @@
+# Gunicorn settings for serving the Dash app: `gunicorn -c gunicorn.conf.py`
+import os
+
+wsgi_app = 'app:server'
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+
+# Import the app once in the master, so the workers share its memory (including the memory-mapped serving
+# dataset) copy-on-write; workers attach new versions of the dataset themselves, without restarting. After pulling
+# new masterfiles, rebuild the dataset with `make serving_dataset` (the ETL does not build it, as it is not committed).
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Pre-warm the figure cache in each worker: threads started in the master do not survive the fork
+    from utils.figures import start_prewarm
+    start_prewarm()
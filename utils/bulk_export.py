@@ -0,0 +1,264 @@
+import pandas as pd
+import numpy as np
+import shapely
+from flask import Flask, Response, abort, request, send_file, stream_with_context
+from utils.serving import serving_dataset, decode
+from utils.spatial_index import spatial_index_folder, load_spatial_index
+from utils.server_metrics import count_cache
+import os, io, json, hashlib, tempfile, threading
+
+# Optional: Parquet exports are only available when `pyarrow` is installed.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+export_formats = {'csv': ('text/csv', 'csv'),
+                  'parquet': ('application/vnd.apache.parquet', 'parquet'),
+                  'geojson': ('application/geo+json', 'geojson')}
+
+
+# ---- Row selection ---- #
+def _row_chunks(dataset: dict, places: list[str], years: list[int], chunk_rows: int):
+    """
+    Yield the selected rows of the serving dataset as arrays of row numbers, at most `chunk_rows` at a time.
+    """
+    pending, size = [], 0
+    for place in places:
+        start, stop = dataset['places'][place]
+        rows = np.arange(start, stop)
+        if years:
+            rows = rows[np.isin(dataset['columns']['YEAR'][start:stop], years)]
+        while len(rows):
+            take = rows[:chunk_rows - size]
+            rows = rows[len(take):]
+            pending.append(take)
+            size += len(take)
+            if size == chunk_rows:
+                yield np.concatenate(pending)
+                pending, size = [], 0
+    if size:
+        yield np.concatenate(pending)
+
+
+def _chunk_frame(dataset: dict, rows: np.ndarray, columns: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({col: decode(dataset, col, dataset['columns'][col][rows]) for col in columns})
+
+
+# ---- Encoders ---- #
+def _csv_chunks(dataset: dict, chunks, columns: list[str]):
+    yield (','.join(columns) + '\n').encode()
+    for rows in chunks:
+        yield _chunk_frame(dataset, rows, columns).to_csv(header = False, index = False).encode()
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only file collecting the bytes written by the Parquet writer, until they are drained into the response.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.buffer.extend(b)
+        return len(b)
+
+    def drain(self) -> bytes:
+        content = bytes(self.buffer)
+        self.buffer.clear()
+        return content
+
+
+def _parquet_chunks(dataset: dict, chunks, columns: list[str]):
+    sink = _Sink()
+    writer = None
+    for rows in chunks:
+        table = pa.Table.from_pandas(_chunk_frame(dataset, rows, columns), preserve_index = False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.drain()
+    if writer is None:
+        writer = pq.ParquetWriter(sink, pa.Table.from_pandas(_chunk_frame(dataset, np.arange(0), columns), preserve_index = False).schema)
+    writer.close()
+    yield sink.drain()
+
+
+def _geojson_chunks(dataset: dict, chunks, columns: list[str]):
+    yield b'{"type":"FeatureCollection","features":['
+    first = True
+    for rows in chunks:
+        df = _chunk_frame(dataset, rows, columns)
+        YEARS = dataset['columns']['YEAR'][rows]
+        GEO_IDS = dataset['columns']['GEO_ID'][rows]
+        geometries = np.full(len(rows), 'null', dtype = object)
+        for YEAR in np.unique(YEARS):
+            index = load_spatial_index(int(YEAR))
+            in_year = np.flatnonzero(YEARS == YEAR)
+            positions = np.searchsorted(index['GEO_ID'], GEO_IDS[in_year]).clip(max = len(index['GEO_ID']) - 1)
+            found = index['GEO_ID'][positions] == GEO_IDS[in_year]
+            geometries[in_year[found]] = shapely.to_geojson(index['geometries'][positions[found]])
+
+        properties = json.loads(df.to_json(orient = 'records'))
+        features = [f'{{"type":"Feature","properties":{json.dumps(props)},"geometry":{geometry}}}'
+                    for props, geometry in zip(properties, geometries)]
+        if features:
+            yield (('' if first else ',') + ','.join(features)).encode()
+            first = False
+    yield b']}'
+
+
+# ---- Cache ---- #
+_prune_lock = threading.Lock()
+
+
+def _prune_cache(cache_folder: str, max_disk_bytes: int, version: str) -> None:
+    """
+    Remove the cached exports of other data versions, then the least recently used ones (by modification time,
+    refreshed on each hit) until the cache fits in `max_disk_bytes`.
+    """
+    with _prune_lock:
+        entries = []
+        for file in os.listdir(cache_folder):
+            file_path = f'{cache_folder}{file}'
+            if file.endswith('.tmp'):
+                continue
+            try:
+                if not file.startswith(f'{version}_'):
+                    os.remove(file_path)
+                    continue
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, file_path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, file_path in sorted(entries):
+            if total <= max_disk_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+# ---- Routes ---- #
+def init_export_routes(server: Flask,
+                       cache_folder: str = 'export_cache/',
+                       chunk_rows: int = 20_000,
+                       cache_min_bytes: int = 1_000_000,
+                       max_disk_bytes: int = 1_000_000_000) -> None:
+    """
+    Serve bulk exports of tract rent data from the serving dataset, streamed as they are generated.
+
+        GET /export?places=LongBeach,Pasadena&years=2015-2023&columns=YEAR,GEO_ID,B25058_001E&format=csv|parquet|geojson
+
+    All places, years and columns are exported when not given. Rows are encoded `chunk_rows` at a time straight
+    from the memory-mapped columns, so memory stays constant however large the export. GeoJSON exports are joined
+    with each year's tract geometries from the spatial index; Parquet exports require `pyarrow`. Exports of at
+    least `cache_min_bytes` are cached by a hash of the query and the data version, and served from the cache after.
+    The cache keeps only exports of the current data version, within `max_disk_bytes` (least recently used first out).
+    Years (and year ranges) must lie within the years of the data, and GeoJSON exports are refused (503) when any
+    exported year has no spatial index.
+
+    :param server: Flask server of the Dash app.
+    :type server: Flask
+
+    :param cache_folder: Folder of the export cache. Default 'export_cache/'.
+    :type cache_folder: str
+
+    :param chunk_rows: Number of rows encoded at a time. Default '20_000'.
+    :type chunk_rows: int
+
+    :param cache_min_bytes: Least size of an export to cache. Default '1_000_000'.
+    :type cache_min_bytes: int
+
+    :param max_disk_bytes: Largest total size of the export cache. Default '1_000_000_000'.
+    :type max_disk_bytes: int
+    """
+    os.makedirs(cache_folder, exist_ok = True)
+
+    def _list_arg(name: str) -> list[str]:
+        return [value for value in request.args.get(name, '').split(',') if value]
+
+    def _years_arg(dataset: dict) -> list[int]:
+        # Years and ranges must lie within the years of the data, so a range never expands to more than those
+        min_year, max_year = int(dataset['columns']['YEAR'].min()), int(dataset['columns']['YEAR'].max())
+        years = set()
+        for value in _list_arg('years'):
+            first, _, last = value.partition('-')
+            if not first.isdigit() or (last and not last.isdigit()):
+                abort(400)
+            first, last = int(first), int(last or first)
+            if not min_year <= first <= last <= max_year:
+                abort(400, description = f'Years must be within {min_year}-{max_year}.')
+            years.update(range(first, last + 1))
+        return sorted(years)
+
+    @server.route('/export')
+    def _export():
+        dataset = serving_dataset()
+        export_format = request.args.get('format', 'csv')
+        places = _list_arg('places') or sorted(dataset['places'])
+        columns = _list_arg('columns') or list(dataset['columns'])
+        years = _years_arg(dataset)
+        if export_format not in export_formats or any(place not in dataset['places'] for place in places) \
+                or any(col not in dataset['columns'] for col in columns):
+            abort(400)
+        if export_format == 'parquet' and pa is None:
+            abort(501)
+
+        if export_format == 'geojson':
+            # Every exported year needs its tract geometries, rather than exporting features without them
+            YEARS = np.unique(np.concatenate([dataset['columns']['YEAR'][slice(*dataset['places'][place])] for place in places]))
+            missing = [int(YEAR) for YEAR in YEARS if (not years or YEAR in years)
+                       and not os.path.exists(f'{spatial_index_folder}{YEAR}_spatial_index.npz')]
+            if missing:
+                abort(503, description = f"No tract geometries for {', '.join(map(str, missing))}.")
+
+        mimetype, extension = export_formats[export_format]
+        query = [dataset['version'], export_format, places, years, columns]
+        if export_format == 'geojson':
+            query.append(sorted(os.listdir(spatial_index_folder)) if os.path.exists(spatial_index_folder) else [])
+        key = hashlib.sha256(json.dumps(query).encode()).hexdigest()
+        file_path = f"{cache_folder}{dataset['version']}_{key}.{extension}"
+        download_name = f'contract_rents.{extension}'
+
+        # Hits refresh the modification time, by which the cache evicts; an export evicted meanwhile is regenerated
+        try:
+            os.utime(file_path)
+            response = send_file(os.path.abspath(file_path), mimetype = mimetype, as_attachment = True,
+                                 download_name = download_name, etag = key, conditional = True)
+            count_cache('exports', True)
+            return response
+        except FileNotFoundError:
+            count_cache('exports', False)
+
+        encoder = {'csv': _csv_chunks, 'parquet': _parquet_chunks, 'geojson': _geojson_chunks}[export_format]
+        chunks = encoder(dataset, _row_chunks(dataset, places, years, chunk_rows), columns)
+
+        def _stream():
+            # Written to the cache alongside the response; kept only if the export completes and is large enough
+            # A unique temporary file, as identical requests may be streamed at once
+            file = tempfile.NamedTemporaryFile(dir = cache_folder, suffix = '.tmp', delete = False)
+            tmp_file_path = file.name
+            completed = False
+            try:
+                with file:
+                    for content in chunks:
+                        file.write(content)
+                        yield content
+                completed = True
+            finally:
+                if completed and os.path.getsize(tmp_file_path) >= cache_min_bytes:
+                    os.replace(tmp_file_path, file_path)
+                    _prune_cache(cache_folder, max_disk_bytes, dataset['version'])
+                else:
+                    os.remove(tmp_file_path)
+
+        return Response(stream_with_context(_stream()), mimetype = mimetype,
+                        headers = {'Content-Disposition': f'attachment; filename={download_name}'})
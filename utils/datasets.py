@@ -1,41 +1,58 @@
 import os
-import pandas as pd
+from instrumentation import stage, write_run_report
+from snapshots import create_snapshot
 from util_func import (
-    masterfiles_folder,
     masterfile_creation,
+    validate_masterfiles,
+    rent_statistics_creation,
+    rent_change_significance,
+    tract_trend_similarity,
     mastergeometry_creation,
+    vintage_geometry_creation,
     lat_lon_center_points
 )
 
-# Masterfile creation
-masterfile_creation(['B25057', 'B25058', 'B25059'], API_key = os.environ['SECRET_KEY'], batch_size = 400)
-
-# Formatting
-ABBREV_NAMES = [file.split('_')[0] for file in os.listdir(masterfiles_folder) if 'masterfile.csv' in file]
-
-for ABBREV_NAME in ABBREV_NAMES:
-    CSV_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.csv'
-    df = pd.read_csv(CSV_file_path)
-
-    df['Median'] = df['B25058_001E']
-    df['75th'] = df['B25059_001E']
-    df['25th'] = df['B25057_001E']
-    for col in ['Median', '75th', '25th']:
-        df[col] = '$' + df[col].astype(str)
-        df[col] = df[col].str.replace('.0', '')
-        df.loc[df[col] == '$nan', col] = 'Not Available!'
-        df.loc[(df[col] == '$2001') & (df['YEAR'] <= 2014), col] = 'Not available. Exceeds $2000!'
-        df.loc[(df[col] == '$3501') & (df['YEAR'] > 2014), col] = 'Not available. Exceeds $3500!'
-
-    df = df.sort_values(by = ['YEAR', 'GEO_ID'], ignore_index = True)
-
-    df.to_csv(CSV_file_path, index = False)
-
-    JSON_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.json'
-    df.to_json(JSON_file_path, orient='records')
-
-# Mastergeometry creation
-mastergeometry_creation()
-
-# Accompanying latitudinal and longitudinal center points
-lat_lon_center_points()
\ No newline at end of file
+# Stage calls run only when executed as a script: worker processes started by the spawn or forkserver methods
+# (e.g. the masterfile writer's pool) re-import this module, and must not re-run the ETL
+if __name__ == '__main__':
+    try:
+        # Masterfile creation
+        with stage('masterfile_creation'):
+            masterfile_creation(['B25057', 'B25058', 'B25059'], API_key = os.environ['SECRET_KEY'], batch_size = 400,
+                                n_workers = int(os.environ.get('ETL_WORKERS', os.cpu_count())))
+
+        # Validation: raises on failure, so nothing below (nor the workflow's commit) publishes invalid data
+        with stage('validate_masterfiles'):
+            validate_masterfiles()
+
+        # Place and county rent statistics
+        with stage('rent_statistics_creation'):
+            rent_statistics_creation()
+
+        # Significance of tract rent changes
+        with stage('rent_change_significance'):
+            rent_change_significance()
+
+        # Tract rent trends and similar tracts
+        with stage('tract_trend_similarity'):
+            tract_trend_similarity()
+
+        # Mastergeometry creation
+        with stage('mastergeometry_creation'):
+            mastergeometry_creation()
+
+        # Tract geometries of each vintage, for the animated map
+        with stage('vintage_geometry_creation'):
+            vintage_geometry_creation()
+
+        # Accompanying latitudinal and longitudinal center points
+        with stage('lat_lon_center_points'):
+            lat_lon_center_points()
+
+        # Publish: snapshot the data files fetched by the app, and make the snapshot the current version
+        with stage('create_snapshot'):
+            create_snapshot()
+
+    finally:
+        # Stage timings, counters and histograms for this run
+        write_run_report('run_report.json')
@@ -0,0 +1,508 @@
+import pandas as pd
+from flask import Flask, Response, abort, request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from utils.server_metrics import count_cache
+from utils.serving import serving_dataset, place_frame
+from utils.snapshots import manifest_file_path, read_manifest
+import os, json, hashlib, tempfile, threading
+
+# Optional: PNG/SVG snapshots are only available when `kaleido` is installed.
+try:
+    import plotly.io as pio
+    import kaleido
+except ImportError:
+    pio = None
+
+data_folder = 'data/'
+lat_lon_folder = f'{data_folder}lat_lon_center_points/'
+significance_folder = f'{data_folder}significance/'
+availability_file_path = f'{data_folder}availability.json'
+data_url = 'https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/'
+
+image_formats = {'png': 'image/png', 'svg': 'image/svg+xml'}
+hoverlabel = {'bgcolor': '#FAFAFA', 'bordercolor': '#BEBEBE', 'font': {'color': '#020403'}}
+
+_lock = threading.Lock()
+_memory = OrderedDict()
+_settings = {'max_entries': 256, 'max_disk_bytes': 256_000_000, 'cache_folder': 'figure_cache/', 'snapshot_workers': 2,
+             'pool': None, 'disk_writes': 0, 'disk_bytes': None, 'prewarm': None}
+_place_hits = {}
+
+
+def _after_fork() -> None:
+    # A worker forked from a preloaded app must not inherit a lock held by the pre-warm thread, or the snapshot pool
+    global _lock
+    _lock = threading.Lock()
+    _settings['pool'] = None
+
+
+os.register_at_fork(after_in_child = _after_fork)
+
+
+# ---- Data ---- #
+def _data_version(*file_paths: str) -> str:
+    """
+    Return a version of the data files a figure is built from, which changes whenever any of them is rewritten.
+    """
+    stats = [os.stat(file_path) for file_path in file_paths if os.path.exists(file_path)]
+    return hashlib.sha256(repr([(stat.st_mtime_ns, stat.st_size) for stat in stats]).encode()).hexdigest()[:16]
+
+
+@lru_cache(maxsize = 16)
+def _masterfile(place: str, version: str) -> pd.DataFrame:
+    df = place_frame(place)
+    return df.astype(object).where(df.notna(), None)
+
+
+@lru_cache(maxsize = 4)
+def _snapshot_files(version: str) -> dict:
+    return read_manifest()['files'] if os.path.exists(manifest_file_path) else {}
+
+
+def _data_file_url(path: str) -> str:
+    """
+    Return the URL of a data file in the current snapshot (or its plain path, for files outside the snapshots),
+    as `window.contractRents.url()` does.
+    """
+    return data_url + _snapshot_files(_data_version(manifest_file_path)).get(path, path)
+
+
+@lru_cache(maxsize = 16)
+def _json_file(file_path: str, version: str):
+    with open(file_path) as jsonfile:
+        return json.load(jsonfile)
+
+
+def has_map(place: str, year: int) -> bool:
+    """
+    Return whether the map of a place can be built for a year: the place has data for the year (per
+    'availability.json') and a center point in the year's lat/lon file.
+    """
+    lat_lon_path = f'{lat_lon_folder}{year}_latlon_center_points.json'
+    if not os.path.exists(availability_file_path) or not os.path.exists(lat_lon_path):
+        return False
+    availability = _json_file(availability_file_path, _data_version(availability_file_path))
+    offset = year - availability['BASE_YEAR']
+    if offset < 0 or not any(ABBREV_NAME == place and (YEARS >> offset) & 1 for _, ABBREV_NAME, YEARS in availability['PLACES']):
+        return False
+    return any(item['ABBREV_NAME'] == place for item in _json_file(lat_lon_path, _data_version(lat_lon_path)))
+
+
+# ---- Figures ---- #
+def map_figure(place: str, year: int, tract: str = None, base_year: int = None) -> dict:
+    """
+    Build the choropleth map of median contract rents for a place and year, as the clientside callback does.
+
+    :param place: Abbreviated place name, e.g. 'LongBeach'.
+    :type place: str
+
+    :param year: Data year.
+    :type year: int
+
+    :param tract: Optional census tract to outline, e.g. 'Census Tract 5764.01'.
+    :type tract: str
+
+    :param base_year: Optional base year; tracts with a significant increase in median rent since then are outlined.
+    :type base_year: int
+
+    :return: Plotly figure.
+    :rtype: dict
+    """
+    lat_lon_path = f'{lat_lon_folder}{year}_latlon_center_points.json'
+    df = _masterfile(place, serving_dataset()['version'])
+    city = df['CITY'].iloc[0] if len(df) else ''
+    df = df[df['YEAR'] == year]
+    lat_lon = [item for item in _json_file(lat_lon_path, _data_version(lat_lon_path)) if item['ABBREV_NAME'] == place][0]
+    url_path = _data_file_url(f'data/mastergeometries/{year}_mastergeometry.geojson')
+
+    template = (f"<b style='font-size:16px;'>%{{customdata[0]}}</b><br>{city}<br><br>"
+                "Median Contract Rent: <br><b style='color:#800000; font-size:14px;'>%{customdata[1]}</b> <br><br>"
+                "25th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>%{customdata[2]}</b> <br><br>"
+                "75th Percentile Contract Rent: <br><b style='color:#B22222; font-size:14px;'>%{customdata[3]}</b> <br><br><extra></extra>")
+
+    data = [{
+        'type': 'choroplethmap',
+        'customdata': df[['TRACT', 'Median', '25th', '75th']].values.tolist(),
+        'geojson': url_path,
+        'locations': df['GEO_ID'].tolist(),
+        'featureidkey': 'properties.GEO_ID',
+        'colorscale': 'YlOrRd',
+        'reversescale': True,
+        'z': df['B25058_001E'].tolist(),
+        'zmin': 0, 'zmax': 3500,
+        'marker': {'line': {'color': '#020403', 'width': 1.75}, 'opacity': 0.7},
+        'colorbar': {'outlinewidth': 2,
+                     'ticklabelposition': 'outside bottom',
+                     'tickprefix': '$',
+                     'title': {'font': {'color': '#020403', 'weight': 500}, 'text': 'Median Contract<br>Rents ($)'}},
+        'hoverlabel': hoverlabel,
+        'hovertemplate': template
+    }]
+
+    layout = {
+        'autosize': True,
+        'hoverlabel': {'align': 'left'},
+        'map': {'center': {'lat': lat_lon['LAT_CENTER'], 'lon': lat_lon['LON_CENTER']}, 'style': 'streets', 'zoom': 10},
+        'margin': {'b': 0, 'l': 0, 'r': 0, 't': 0},
+        'paper_bgcolor': '#FEF9F3',
+        'plot_bgcolor': '#FEF9F3',
+    }
+
+    if tract is not None:
+        aux_locations = df.loc[df['TRACT'] == tract, 'GEO_ID'].tolist()
+        data.append({
+            'type': 'choroplethmap',
+            'geojson': url_path,
+            'locations': aux_locations,
+            'featureidkey': 'properties.GEO_ID',
+            'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+            'showscale': False,
+            'z': aux_locations,
+            'zmin': 0, 'zmax': 1,
+            'marker': {'line': {'color': '#04D9FF', 'width': 4}},
+            'selected': {'marker': {'opacity': 0.4}},
+            'hoverinfo': 'skip',
+        })
+
+    if base_year is not None and base_year < year:
+        significance_path = f'{significance_folder}{year}_significance.json'
+        significance = _json_file(significance_path, _data_version(significance_path)) if os.path.exists(significance_path) else {}
+        sig_locations = [GEO_ID for GEO_ID in df['GEO_ID'] if base_year in significance.get(str(GEO_ID), [])]
+        data.append({
+            'type': 'choroplethmap',
+            'name': f'Significant increase since {base_year}',
+            'geojson': url_path,
+            'locations': sig_locations,
+            'featureidkey': 'properties.GEO_ID',
+            'colorscale': [[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+            'showscale': False,
+            'showlegend': True,
+            'z': [1] * len(sig_locations),
+            'zmin': 0, 'zmax': 1,
+            'marker': {'line': {'color': '#2A9D8F', 'width': 3}},
+            'hoverinfo': 'skip',
+        })
+        layout['legend'] = {'x': 0.01, 'y': 0.99, 'bgcolor': 'rgba(254,249,243,0.8)'}
+
+    return {'data': data, 'layout': layout}
+
+
+def plot_figure(place: str, tract: str) -> dict:
+    """
+    Build the plot of a census tract's contract rents over the years, as the clientside callback does.
+
+    :param place: Abbreviated place name, e.g. 'LongBeach'.
+    :type place: str
+
+    :param tract: Census tract, e.g. 'Census Tract 5764.01'.
+    :type tract: str
+
+    :return: Plotly figure.
+    :rtype: dict
+    """
+    df = _masterfile(place, serving_dataset()['version'])
+    df = df[df['TRACT'] == tract].sort_values('YEAR')
+    x_array = df['YEAR'].tolist()
+
+    header = f"<b style='font-size:16px;'>%{{x}}</b><br>{tract}, {df['CITY'].iloc[0] if len(df) else ''} <br><br>"
+
+    def template(label, color):
+        return f"{header}{label}: <br><b style='color:{color}; font-size:14px;'>%{{text}}</b> <br><br><extra></extra>"
+
+    data = [{
+        'type': 'scatter',
+        'x': x_array,
+        'y': df['B25058_001E'].tolist(),
+        'mode': 'lines+markers',
+        'line': {'color': '#800000'},
+        'marker': {'size': 10, 'line': {'width': 2, 'color': '#F5FBFF'}},
+        'text': df['Median'].tolist(),
+        'hoverlabel': hoverlabel,
+        'hovertemplate': template('Median Contract Rent', '#800000'),
+        'showlegend': False,
+        'zorder': 1
+    }, {'type': 'scatter',
+        'x': x_array,
+        'y': df['B25059_001E'].tolist(),
+        'mode': 'lines',
+        'marker': {'color': '#83e6b5'},
+        'line': {'width': 0},
+        'text': df['75th'].tolist(),
+        'hoverlabel': hoverlabel,
+        'hovertemplate': template('75th Percentile Contract Rent', '#B22222'),
+        'showlegend': False,
+    }, {'type': 'scatter',
+        'x': x_array,
+        'y': df['B25057_001E'].tolist(),
+        'mode': 'lines',
+        'fill': 'tonexty',
+        'fillcolor': 'rgba(153, 170, 187, 0.5)',
+        'marker': {'color': '#83e6b5'},
+        'line': {'width': 0},
+        'text': df['25th'].tolist(),
+        'hoverlabel': hoverlabel,
+        'hovertemplate': template('25th Percentile Contract Rent', '#B22222'),
+        'showlegend': False,
+    }]
+
+    layout = {
+        'font': {'color': '#020403'},
+        'hoverlabel': {'align': 'left'},
+        'margin': {'b': 40, 't': 40, 'r': 20},
+        'autosize': True,
+        'uirevision': True,
+        'paper_bgcolor': '#FEF9F3',
+        'plot_bgcolor': '#FEF9F3',
+        'title': {'text': f'<b>Median Contract Rents</b>, {min(x_array, default = "")} to {max(x_array, default = "")}', 'x': 0.05},
+        'xaxis': {'title': {'text': '<b>Year</b>', 'ticklabelstandoff': 10, 'font': {'size': 14}}, 'showgrid': False, 'tick0': min(x_array, default = None), 'dtick': 2, 'ticks': '', 'tickfont': {'color': '#666666'}},
+        'yaxis': {'title': {'text': '<b>Contract Rents ($)</b>', 'standoff': 15, 'font': {'size': 14}}, 'tickprefix': '$', 'gridcolor': '#E0E0E0', 'ticklabelstandoff': 5, 'ticks': '', 'tickfont': {'color': '#666666'}},
+    }
+
+    return {'data': data, 'layout': layout}
+
+
+# ---- Figure cache ---- #
+def _cache_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+def _write_atomic(file_path: str, content: bytes) -> None:
+    # A unique temporary file per writer, so threads (and workers) writing the same file never interleave
+    with tempfile.NamedTemporaryFile(dir = os.path.dirname(file_path), suffix = '.tmp', delete = False) as file:
+        file.write(content)
+    os.replace(file.name, file_path)
+
+
+def _prune_disk() -> None:
+    """
+    Remove the least recently used figures from the disk tier until it fits in `max_disk_bytes`.
+    """
+    entries = []
+    for root, _, files in os.walk(_settings['cache_folder']):
+        for file in files:
+            if root.rstrip('/') != _settings['cache_folder'].rstrip('/'):
+                try:
+                    stat = os.stat(f'{root}/{file}')
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, f'{root}/{file}'))
+    total = sum(size for _, size, _ in entries)
+    for _, size, file_path in sorted(entries):
+        if total <= _settings['max_disk_bytes']:
+            break
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    _settings['disk_bytes'] = total
+
+
+def _render_image(figure: dict, image_format: str) -> bytes:
+    """
+    Render a figure as a static image (run in the snapshot process pool).
+    """
+    return pio.to_image(figure, format = image_format, width = 1200, height = 800)
+
+
+def cached_figure(key: str, build, image_format: str = 'json') -> bytes:
+    """
+    Return a figure (as JSON, or as a PNG/SVG snapshot) from the figure cache, building it on a miss.
+
+    Figures are looked up in an in-memory LRU tier, then in a disk tier shared by the workers, and written
+    to both on a miss. The disk tier is kept within `max_disk_bytes` by evicting its least recently used figures
+    (by modification time, refreshed on each hit). Snapshots are rendered in a process pool.
+
+    :param key: Cache key, covering everything the figure depends on (including the data version).
+    :type key: str
+
+    :param build: Function building the figure.
+    :type build: Callable[[], dict]
+
+    :param image_format: 'json', 'png' or 'svg'. Default 'json'.
+    :type image_format: str
+
+    :return: Serialized figure or snapshot.
+    :rtype: bytes
+    """
+    key = f'{key}.{image_format}'
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            count_cache('figures.memory', True)
+            return _memory[key]
+    count_cache('figures.memory', False)
+
+    file_path = f"{_settings['cache_folder']}{key[:2]}/{key}"
+    try:
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        os.utime(file_path)
+        count_cache('figures.disk', True)
+    except FileNotFoundError:
+        count_cache('figures.disk', False)
+        figure = build()
+        if image_format == 'json':
+            content = json.dumps(figure, separators = (',', ':')).encode()
+        else:
+            if _settings['pool'] is None:
+                _settings['pool'] = ProcessPoolExecutor(max_workers = _settings['snapshot_workers'])
+            content = _settings['pool'].submit(_render_image, figure, image_format).result()
+
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+        _write_atomic(file_path, content)
+        # The size of the disk tier is tracked from this process' writes, and rescanned periodically for the others'
+        with _lock:
+            _settings['disk_writes'] += 1
+            if _settings['disk_bytes'] is not None:
+                _settings['disk_bytes'] += len(content)
+            prune = _settings['disk_bytes'] is None or _settings['disk_bytes'] > _settings['max_disk_bytes'] \
+                or _settings['disk_writes'] % 50 == 0
+        if prune:
+            _prune_disk()
+
+    with _lock:
+        _memory[key] = content
+        while len(_memory) > _settings['max_entries']:
+            _memory.popitem(last = False)
+    return content
+
+
+def _map_key(place: str, year: int, tract: str, base_year: int) -> str:
+    file_paths = [f'{lat_lon_folder}{year}_latlon_center_points.json', manifest_file_path]
+    if base_year is not None:
+        file_paths.append(f'{significance_folder}{year}_significance.json')
+    return _cache_key('map', place, year, tract, base_year, serving_dataset()['version'], _data_version(*file_paths))
+
+
+def _plot_key(place: str, tract: str) -> str:
+    return _cache_key('plot', place, tract, serving_dataset()['version'])
+
+
+# ---- Popular places ---- #
+def _record_hit(place: str) -> None:
+    """
+    Count a figure request for `place`, periodically saving the most requested places for the next pre-warm.
+    """
+    with _lock:
+        _place_hits[place] = _place_hits.get(place, 0) + 1
+        if sum(_place_hits.values()) % 100 != 0:
+            return
+        popular_places = sorted(_place_hits, key = _place_hits.get, reverse = True)
+    _write_atomic(f"{_settings['cache_folder']}popular_places.json", json.dumps(popular_places).encode())
+
+
+def prewarm(places: list[str], year: int) -> None:
+    """
+    Build the default maps (no tract selected) of `places` for `year` into the figure cache.
+
+    :param places: Abbreviated place names.
+    :type places: list[str]
+
+    :param year: Data year.
+    :type year: int
+    """
+    for place in places:
+        if place in serving_dataset()['places'] and has_map(place, year):
+            cached_figure(_map_key(place, year, None, None), lambda: map_figure(place, year))
+
+
+def start_prewarm() -> None:
+    """
+    Pre-warm the figure cache with the maps of the most requested places, in a background thread of this process.
+
+    Call it in each process serving requests, once the routes are set up: in gunicorn's `post_fork` hook (a thread
+    started in the master before the fork would not run in the workers), or before `app.run()`.
+    """
+    if _settings['prewarm'] is not None:
+        threading.Thread(target = prewarm, args = _settings['prewarm'], daemon = True).start()
+
+
+# ---- Routes ---- #
+def init_figure_routes(server: Flask,
+                       places: list[str],
+                       default_year: int,
+                       max_entries: int = 256,
+                       max_disk_bytes: int = 256_000_000,
+                       cache_folder: str = 'figure_cache/',
+                       prewarm_places: list[str] = None,
+                       n_prewarm: int = 10,
+                       snapshot_workers: int = 2) -> None:
+    """
+    Serve server-side rendered figures, for clients that cannot (or should not) build them from the data files.
+
+        GET /figures/map/<place>/<year>?tract=...&base_year=...&format=json|png|svg
+        GET /figures/plot/<place>?tract=...&format=json|png|svg
+
+    Figures are served from an LRU and disk cache keyed by the request and the version of the data files, with
+    ETags for revalidation. PNG/SVG snapshots require `kaleido`. The maps of the most requested places (recorded in
+    `cache_folder`, else `prewarm_places`) are pre-warmed by `start_prewarm()`.
+
+    :param server: Flask server of the Dash app.
+    :type server: Flask
+
+    :param places: Abbreviated names of the places served.
+    :type places: list[str]
+
+    :param default_year: Year of the pre-warmed maps.
+    :type default_year: int
+
+    :param max_entries: Number of figures kept in memory. Default '256'.
+    :type max_entries: int
+
+    :param max_disk_bytes: Size of the disk tier. Default '256_000_000'.
+    :type max_disk_bytes: int
+
+    :param cache_folder: Folder of the disk tier. Default 'figure_cache/'.
+    :type cache_folder: str
+
+    :param prewarm_places: Places to pre-warm before any requests have been recorded. Default 'None'.
+    :type prewarm_places: list[str]
+
+    :param n_prewarm: Number of places to pre-warm. Default '10'.
+    :type n_prewarm: int
+
+    :param snapshot_workers: Number of processes rendering snapshots. Default '2'.
+    :type snapshot_workers: int
+    """
+    _settings.update(max_entries = max_entries, max_disk_bytes = max_disk_bytes, cache_folder = cache_folder, snapshot_workers = snapshot_workers)
+    os.makedirs(cache_folder, exist_ok = True)
+    places = set(places)
+
+    def _respond(key: str, build):
+        image_format = request.args.get('format', 'json')
+        if image_format != 'json' and image_format not in image_formats:
+            abort(400)
+        if image_format != 'json' and pio is None:
+            abort(501)
+        response = Response(cached_figure(key, build, image_format),
+                            mimetype = image_formats.get(image_format, 'application/json'))
+        response.set_etag(f'{key}.{image_format}')
+        response.cache_control.public = True
+        response.cache_control.max_age = 3600
+        return response.make_conditional(request)
+
+    @server.route('/figures/map/<place>/<int:year>')
+    def _map(place, year):
+        if place not in places or not has_map(place, year):
+            abort(404)
+        tract = request.args.get('tract')
+        base_year = request.args.get('base_year', type = int)
+        _record_hit(place)
+        return _respond(_map_key(place, year, tract, base_year), lambda: map_figure(place, year, tract, base_year))
+
+    @server.route('/figures/plot/<place>')
+    def _plot(place):
+        tract = request.args.get('tract')
+        if place not in places or tract is None:
+            abort(404)
+        _record_hit(place)
+        return _respond(_plot_key(place, tract), lambda: plot_figure(place, tract))
+
+    popular_places = prewarm_places or []
+    if os.path.exists(f'{cache_folder}popular_places.json'):
+        with open(f'{cache_folder}popular_places.json') as jsonfile:
+            popular_places = json.load(jsonfile)
+    _settings['prewarm'] = ([place for place in popular_places if place in places][:n_prewarm], default_year)
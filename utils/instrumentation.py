@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+from datetime import datetime
+import os, json, time
+
+# OpenTelemetry is optional: spans are only emitted when the API is installed (and exported when an SDK is configured).
+try:
+    from opentelemetry import trace
+    tracer = trace.get_tracer('contract-rents-etl')
+except ImportError:
+    tracer = None
+
+# Histogram bucket upper bounds (seconds)
+latency_buckets = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+run_report = {'started': datetime.now().isoformat(timespec = 'seconds'), 'stages': {}, 'counters': {}, 'histograms': {}}
+
+
+# ---- Stage timing ---- #
+@contextmanager
+def stage(name: str):
+    """
+    Record the wall time of a stage of the ETL, and trace it as an OpenTelemetry span when available.
+
+    Repeated stages of the same name accumulate their wall time and number of calls.
+
+    :param name: Stage name, e.g. 'ACS_data_extraction.http'.
+    :type name: str
+    """
+    start = time.perf_counter()
+    try:
+        if tracer is None:
+            yield
+        else:
+            with tracer.start_as_current_span(name):
+                yield
+    finally:
+        entry = run_report['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+        entry['seconds'] += time.perf_counter() - start
+        entry['calls'] += 1
+
+
+# ---- Counters and histograms ---- #
+def count(name: str, value: int = 1) -> None:
+    """
+    Increment a counter, e.g. retries, bytes in/out or dropped responses.
+
+    :param name: Counter name.
+    :type name: str
+
+    :param value: Increment. Default '1'.
+    :type value: int
+    """
+    run_report['counters'][name] = run_report['counters'].get(name, 0) + value
+
+
+def observe(name: str, value: float) -> None:
+    """
+    Record an observation (e.g. a request latency in seconds) in a histogram.
+
+    :param name: Histogram name.
+    :type name: str
+
+    :param value: Observed value.
+    :type value: float
+    """
+    histogram = run_report['histograms'].setdefault(name, {'count': 0, 'sum': 0.0, 'min': value, 'max': value,
+                                                           'buckets': [0] * (len(latency_buckets) + 1)})
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['min'] = min(histogram['min'], value)
+    histogram['max'] = max(histogram['max'], value)
+    histogram['buckets'][sum(value > bound for bound in latency_buckets)] += 1
+
+
+def count_file_bytes(name: str, file_path: str) -> None:
+    """
+    Add the size of a written file to the counter `name`.
+    """
+    count(name, os.path.getsize(file_path))
+
+
+# ---- Run report ---- #
+def write_run_report(file_path: str) -> None:
+    """
+    Write the stage timings, counters and histograms recorded so far as a JSON run report.
+
+    :param file_path: Path of the JSON run report.
+    :type file_path: str
+    """
+    report = dict(run_report, finished = datetime.now().isoformat(timespec = 'seconds'))
+    report['histograms'] = {name: dict(histogram, bucket_bounds = latency_buckets + ['inf'])
+                            for name, histogram in run_report['histograms'].items()}
+    with open(file_path, 'w') as jsonfile:
+        json.dump(report, jsonfile, indent = 2)
@@ -0,0 +1,186 @@
+from flask import Flask, Response, g, request
+from datetime import datetime
+import os, time, random, cProfile, resource, threading
+
+# Histogram bucket upper bounds
+latency_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+size_buckets = [1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 25_000_000]
+
+_lock = threading.Lock()
+_profile_lock = threading.Lock()  # cProfile is process-wide from Python 3.12, so one request is profiled at a time
+_latency = {}
+_size = {}
+_status = {}
+_cache = {}
+
+
+def _observe(histograms: dict, buckets: list, route: str, value: float) -> None:
+    histogram = histograms.setdefault(route, {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0})
+    histogram['buckets'][sum(value > bound for bound in buckets)] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def _counted(chunks, route: str):
+    """
+    Pass through the chunks of a streamed response, recording its size once it has been sent (or abandoned).
+    """
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        with _lock:
+            _observe(_size, size_buckets, route, size)
+
+
+# ---- Cache counters ---- #
+def count_cache(cache: str, hit: bool) -> None:
+    """
+    Record a cache lookup, for the cache hit ratios reported on `/metrics`.
+
+    HTTP revalidations are recorded automatically under the 'http' cache (304 responses are hits).
+
+    :param cache: Cache name.
+    :type cache: str
+
+    :param hit: Whether the lookup was a hit.
+    :type hit: bool
+    """
+    with _lock:
+        counts = _cache.setdefault(cache, {'hit': 0, 'miss': 0})
+        counts['hit' if hit else 'miss'] += 1
+
+
+# ---- Prometheus exposition ---- #
+def _histogram_lines(name: str, help_text: str, histograms: dict, buckets: list, labels: str) -> list[str]:
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for route, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(buckets + ['+Inf'], histogram['buckets']):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels},route="{route}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels},route="{route}"}} {histogram["sum"]}')
+        lines.append(f'{name}_count{{{labels},route="{route}"}} {histogram["count"]}')
+    return lines
+
+
+def _worker_rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def metrics_text() -> str:
+    """
+    Return this worker's metrics in the Prometheus text exposition format.
+
+    Under gunicorn, each worker keeps its own metrics, labelled with its pid.
+    """
+    labels = f'pid="{os.getpid()}"'
+    with _lock:
+        lines = _histogram_lines('http_request_duration_seconds', 'Request latency by route.', _latency, latency_buckets, labels)
+        lines += _histogram_lines('http_response_size_bytes', 'Response size by route.', _size, size_buckets, labels)
+
+        lines += ['# HELP http_responses_total Responses by route and status.', '# TYPE http_responses_total counter']
+        for (route, status), value in sorted(_status.items()):
+            lines.append(f'http_responses_total{{{labels},route="{route}",status="{status}"}} {value}')
+
+        lines += ['# HELP cache_lookups_total Cache lookups by cache and result.', '# TYPE cache_lookups_total counter']
+        for cache, counts in sorted(_cache.items()):
+            for result, value in counts.items():
+                lines.append(f'cache_lookups_total{{{labels},cache="{cache}",result="{result}"}} {value}')
+
+    lines += ['# HELP process_resident_memory_bytes Resident memory of this worker.', '# TYPE process_resident_memory_bytes gauge',
+              f'process_resident_memory_bytes{{{labels}}} {_worker_rss_bytes()}',
+              '# HELP process_max_resident_memory_bytes Peak resident memory of this worker.', '# TYPE process_max_resident_memory_bytes gauge',
+              f'process_max_resident_memory_bytes{{{labels}}} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}']
+    return '\n'.join(lines) + '\n'
+
+
+# ---- Middleware ---- #
+def init_server_metrics(server: Flask,
+                        profile_sample_rate: float = 0.0,
+                        profile_slow_ms: float = 1000.0,
+                        profiles_folder: str = 'profiles/') -> None:
+    """
+    Record per-route latencies, response sizes, statuses and cache hits on the Flask server, and expose them
+    (with the worker's memory) on a Prometheus-style `/metrics` endpoint.
+
+    Streamed responses (with no Content-Length) have their size recorded as their chunks are sent.
+
+    A sampled fraction of requests can also be profiled with cProfile; the profiles of sampled requests slower
+    than `profile_slow_ms` are dumped to `profiles_folder`. Only one request is profiled at a time: a sampled
+    request that arrives while another is being profiled is not profiled.
+
+    :param server: Flask server of the Dash app.
+    :type server: Flask
+
+    :param profile_sample_rate: Fraction of requests to profile. Default '0.0' (profiling off).
+    :type profile_sample_rate: float
+
+    :param profile_slow_ms: Latency (in milliseconds) above which a sampled request's profile is kept. Default '1000.0'.
+    :type profile_slow_ms: float
+
+    :param profiles_folder: Folder for the `.prof` files of slow requests. Default 'profiles/'.
+    :type profiles_folder: str
+    """
+    @server.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_profiler = None
+        if profile_sample_rate > 0 and random.random() < profile_sample_rate and _profile_lock.acquire(blocking = False):
+            g.metrics_profiler = cProfile.Profile()
+            try:
+                g.metrics_profiler.enable()
+            except ValueError:
+                # Another profiling tool (e.g. a debugger) is active
+                g.metrics_profiler = None
+                _profile_lock.release()
+
+    @server.after_request
+    def _record(response):
+        if 'metrics_start' not in g or request.path == '/metrics':
+            return response
+        seconds = time.perf_counter() - g.metrics_start
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        streamed = response.content_length is None and response.is_streamed
+
+        with _lock:
+            _observe(_latency, latency_buckets, route, seconds)
+            if not streamed:
+                _observe(_size, size_buckets, route, response.content_length or 0)
+            _status[(route, response.status_code)] = _status.get((route, response.status_code), 0) + 1
+        if request.method == 'GET' and response.status_code in (200, 304):
+            count_cache('http', response.status_code == 304)
+
+        if streamed:
+            response.response = _counted(response.response, route)
+
+        if g.metrics_profiler is not None:
+            profiler, g.metrics_profiler = g.metrics_profiler, None
+            profiler.disable()
+            _profile_lock.release()
+            if seconds * 1000 > profile_slow_ms:
+                if not os.path.exists(profiles_folder):
+                    os.makedirs(profiles_folder)
+                route_name = route.strip('/').replace('/', '_').replace('<', '').replace('>', '').replace(':', '-') or 'index'
+                profiler.dump_stats(f"{profiles_folder}{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{os.getpid()}_{route_name}.prof")
+        return response
+
+    @server.teardown_request
+    def _stop_profiler(exception):
+        # A request that failed before its response was recorded must still release the profiler
+        if g.get('metrics_profiler') is not None:
+            profiler, g.metrics_profiler = g.metrics_profiler, None
+            profiler.disable()
+            _profile_lock.release()
+
+    @server.route('/metrics')
+    def _metrics():
+        return Response(metrics_text(), mimetype = 'text/plain; version=0.0.4')
@@ -0,0 +1,176 @@
+import pandas as pd
+import numpy as np
+import os, json, time, shutil, hashlib, tempfile, threading, argparse
+
+serving_folder = 'data/serving/'
+check_interval = 1.0  # Seconds between checks of 'CURRENT' for a new version
+
+_lock = threading.Lock()
+_state = {'stat': None, 'checked': 0.0, 'dataset': None}
+
+
+def _after_fork() -> None:
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child = _after_fork)
+
+
+# ---- Building ---- #
+def build_serving_dataset(masterfiles_folder: str = 'data/masterfiles/', keep_versions: int = 2) -> str:
+    """
+    Build the serving dataset from the masterfiles: one NumPy file per column, memory-mapped read-only by the
+    app's workers.
+
+    Rows are sorted by place, year and GEO_ID, so each place is a contiguous slice. String columns are stored as
+    integer codes into their categories. Each build is written to its own version folder 'serving/v{hash}/', and
+    'serving/CURRENT' is then swapped to point to it; workers pick up the new version without restarting. A build
+    of unchanged masterfiles leaves everything as it is. Only the `keep_versions` most recent versions are kept.
+
+    The app builds it at startup; after pulling new masterfiles into a running deployment, rebuild it with
+    `python utils/serving.py` (`make serving_dataset`).
+
+    :param masterfiles_folder: Folder of the masterfiles. Default 'data/masterfiles/'.
+    :type masterfiles_folder: str
+
+    :param keep_versions: Number of versions to keep. Default '2'.
+    :type keep_versions: int
+
+    :return: Version of the serving dataset.
+    :rtype: str
+    """
+    os.makedirs(serving_folder, exist_ok = True)
+    files = sorted([file for file in os.listdir(masterfiles_folder) if file.endswith('masterfile.csv')])
+    df = pd.concat([pd.read_csv(f'{masterfiles_folder}{file}') for file in files], ignore_index = True)
+    df = df.sort_values(['ABBREV_NAME', 'YEAR', 'GEO_ID'], kind = 'stable', ignore_index = True)
+
+    columns, categories = {}, {}
+    for col in df.columns:
+        if df[col].dtype == object:
+            codes, uniques = pd.factorize(df[col], sort = True)
+            columns[col] = codes.astype(np.int32)
+            categories[col] = uniques.tolist()
+        else:
+            columns[col] = df[col].to_numpy()
+
+    places = categories['ABBREV_NAME']
+    offsets = np.searchsorted(columns['ABBREV_NAME'], np.arange(len(places) + 1))
+    meta = {'ROWS': len(df),
+            'COLUMNS': list(columns),
+            'CATEGORIES': categories,
+            'PLACES': {place: [int(offsets[i]), int(offsets[i + 1])] for i, place in enumerate(places)}}
+
+    digest = hashlib.sha256(json.dumps(meta).encode())
+    for col in columns:
+        digest.update(np.ascontiguousarray(columns[col]).tobytes())
+    version = f'v{digest.hexdigest()[:12]}'
+
+    # Unique temporary names, as several processes (e.g. workers without `preload_app`) may build at once
+    version_folder = f'{serving_folder}{version}/'
+    if not os.path.exists(version_folder):
+        tmp_folder = tempfile.mkdtemp(prefix = f'tmp_{version}_', dir = serving_folder)
+        os.chmod(tmp_folder, 0o755)
+        for col, values in columns.items():
+            np.save(f'{tmp_folder}/{col}.npy', values)
+        with open(f'{tmp_folder}/meta.json', 'w') as jsonfile:
+            json.dump(meta, jsonfile, separators = (',', ':'))
+        try:
+            os.rename(tmp_folder, version_folder)
+        except OSError:
+            shutil.rmtree(tmp_folder)
+
+    current = f'{serving_folder}CURRENT'
+    if os.path.exists(current):
+        with open(current) as file:
+            if file.read().strip() == version:
+                return version
+    with tempfile.NamedTemporaryFile('w', dir = serving_folder, suffix = '.tmp', delete = False) as file:
+        file.write(version)
+    os.replace(file.name, current)
+
+    # Workers still attached to a removed version keep reading it until they next check CURRENT
+    versions = sorted([folder for folder in os.listdir(serving_folder) if folder.startswith('v')],
+                      key = lambda folder: os.path.getmtime(f'{serving_folder}{folder}'), reverse = True)
+    for folder in [folder for folder in versions if folder != version][keep_versions - 1:]:
+        shutil.rmtree(f'{serving_folder}{folder}', ignore_errors = True)
+    return version
+
+
+# ---- Attaching ---- #
+def _open_version(version: str) -> dict:
+    version_folder = f'{serving_folder}{version}/'
+    with open(f'{version_folder}meta.json') as jsonfile:
+        meta = json.load(jsonfile)
+    return {'version': version,
+            'rows': meta['ROWS'],
+            'columns': {col: np.load(f'{version_folder}{col}.npy', mmap_mode = 'r') for col in meta['COLUMNS']},
+            'categories': {col: np.array(values, dtype = object) for col, values in meta['CATEGORIES'].items()},
+            'places': {place: tuple(bounds) for place, bounds in meta['PLACES'].items()}}
+
+
+def serving_dataset() -> dict:
+    """
+    Return the current serving dataset, as written by `build_serving_dataset()`.
+
+    Columns are memory-mapped read-only, so every worker shares the same pages (through the page cache, and
+    through the mapping itself when attached before a `preload_app` fork). 'CURRENT' is checked at most every
+    `check_interval` seconds, and a new version is attached as soon as a data build swaps it in.
+
+    :return: 'version', 'rows', 'columns' (column -> memory-mapped array; string columns hold category codes),
+             'categories' (string column -> categories) and 'places' (ABBREV_NAME -> (start, stop) rows).
+    :rtype: dict
+    """
+    now = time.monotonic()
+    if _state['dataset'] is not None and now - _state['checked'] < check_interval:
+        return _state['dataset']
+
+    with _lock:
+        stat = os.stat(f'{serving_folder}CURRENT')
+        stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stat != _state['stat']:
+            with open(f'{serving_folder}CURRENT') as file:
+                _state['dataset'] = _open_version(file.read().strip())
+            _state['stat'] = stat
+        _state['checked'] = now
+    return _state['dataset']
+
+
+# ---- Queries ---- #
+def decode(dataset: dict, col: str, values: np.ndarray) -> np.ndarray:
+    """
+    Return the values of a column slice, with string columns decoded from their category codes (missing values as None).
+    """
+    if col not in dataset['categories']:
+        return np.asarray(values)
+    decoded = dataset['categories'][col].take(values, mode = 'clip')
+    decoded[values < 0] = None
+    return decoded
+
+
+def place_frame(place: str, columns: list[str] = None) -> pd.DataFrame:
+    """
+    Return the rows of a place as a DataFrame, as in its masterfile.
+
+    :param place: Abbreviated place name, e.g. 'LongBeach'.
+    :type place: str
+
+    :param columns: Columns to return. Default all.
+    :type columns: list[str]
+
+    :return: Rows of the place, sorted by year and GEO_ID.
+    :rtype: pd.DataFrame
+    """
+    dataset = serving_dataset()
+    start, stop = dataset['places'][place]
+    columns = columns or list(dataset['columns'])
+    return pd.DataFrame({col: decode(dataset, col, dataset['columns'][col][start:stop]) for col in columns})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Build the serving dataset of the app server, and make it the current version.')
+    parser.add_argument('--masterfiles-folder', default = 'data/masterfiles/', help = "Folder of the masterfiles. Default 'data/masterfiles/'.")
+    parser.add_argument('--keep-versions', type = int, default = 2, help = "Number of versions to keep. Default '2'.")
+    args = parser.parse_args()
+
+    print(build_serving_dataset(args.masterfiles_folder, keep_versions = args.keep_versions))
@@ -0,0 +1,157 @@
+from datetime import datetime
+import os, json, hashlib, argparse
+
+data_folder = 'data/'
+objects_folder = f'{data_folder}objects/'
+manifests_folder = f'{data_folder}manifests/'
+manifest_file_path = f'{data_folder}manifest.json'
+
+# Data files fetched by the app: (folder or file, file suffix)
+published_paths = [
+    ('data/masterfiles/', '_masterfile.json'),
+    ('data/lat_lon_center_points/', '.json'),
+    ('data/mastergeometries/', '.geojson'),
+    ('data/vintage_geometries/', '.geojson'),
+    ('data/significance/', '.json'),
+    ('data/rent_statistics.json', ''),
+    ('data/tract_trends.json', ''),
+    ('data/availability.json', ''),
+]
+
+
+# ---- Helpers ---- #
+def published_files() -> list[str]:
+    """
+    Return the paths of the data files fetched by the app that currently exist.
+    """
+    files = []
+    for path, suffix in published_paths:
+        if not os.path.exists(path):
+            continue
+        files.extend([f'{path}{file}' for file in sorted(os.listdir(path)) if file.endswith(suffix)] if path.endswith('/') else [path])
+    return files
+
+
+def _write_atomic(file_path: str, json_dict: dict) -> None:
+    with open(f'{file_path}.tmp', 'w') as jsonfile:
+        json.dump(json_dict, jsonfile, indent = 1)
+    os.replace(f'{file_path}.tmp', file_path)
+
+
+def read_manifest(version: str | None = None) -> dict:
+    """
+    Return a snapshot manifest: the current one, or that of `version`.
+
+    :return: 'version', 'created' and 'files' (published path -> object path).
+    :rtype: dict
+    """
+    if version is None:
+        with open(manifest_file_path) as jsonfile:
+            version = json.load(jsonfile)['version']
+    with open(f'{manifests_folder}{version}.json') as jsonfile:
+        return json.load(jsonfile)
+
+
+# ---- Snapshots ---- #
+def create_snapshot(keep_versions: int = 30) -> str:
+    """
+    Snapshot the published data files, and make the snapshot the current version.
+
+    Each file is stored once under its content hash in 'objects/', so files unchanged between versions are never
+    duplicated. A version's manifest ('manifests/{version}.json') maps each published path to its object, and
+    'manifest.json' names the current version (with the previous ones, for rollbacks). Objects are immutable, so
+    they can be cached indefinitely; the app pins the version named by 'manifest.json' when it loads.
+
+    :param keep_versions: Number of versions to keep; objects only referenced by older versions are removed. Default '30'.
+    :type keep_versions: int
+
+    :return: Version of the snapshot.
+    :rtype: str
+    """
+    files = {}
+    for file_path in published_files():
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = f'{objects_folder}{digest[:2]}/{digest}{os.path.splitext(file_path)[1]}'
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok = True)
+            with open(f'{object_path}.tmp', 'wb') as file:
+                file.write(content)
+            os.replace(f'{object_path}.tmp', object_path)
+        files[file_path] = object_path
+
+    version = hashlib.sha256(json.dumps(files, sort_keys = True).encode()).hexdigest()[:12]
+    os.makedirs(manifests_folder, exist_ok = True)
+    if not os.path.exists(f'{manifests_folder}{version}.json'):
+        _write_atomic(f'{manifests_folder}{version}.json',
+                      {'version': version, 'created': datetime.now().isoformat(timespec = 'seconds'), 'files': files})
+
+    history = []
+    if os.path.exists(manifest_file_path):
+        with open(manifest_file_path) as jsonfile:
+            pointer = json.load(jsonfile)
+        history = [pointer['version']] + pointer['history']
+    history = [previous for previous in dict.fromkeys(history) if previous != version][:keep_versions - 1]
+    _write_atomic(manifest_file_path, {'version': version, 'history': history})
+
+    prune_snapshots([version] + history)
+    return version
+
+
+def rollback(version: str | None = None) -> str:
+    """
+    Make an earlier snapshot the current version, by swapping 'manifest.json' (no data files are rewritten).
+
+    :param version: Version to roll back to. Default 'None' (the previous version).
+    :type version: str | None
+
+    :return: Version now current.
+    :rtype: str
+    """
+    with open(manifest_file_path) as jsonfile:
+        pointer = json.load(jsonfile)
+    versions = [pointer['version']] + pointer['history']
+    if version is None:
+        if len(versions) < 2:
+            raise ValueError('There is no previous version to roll back to.')
+        version = versions[1]
+    if not os.path.exists(f'{manifests_folder}{version}.json'):
+        raise ValueError(f'Unknown version {version}.')
+
+    _write_atomic(manifest_file_path, {'version': version, 'history': [previous for previous in versions if previous != version]})
+    return version
+
+
+def prune_snapshots(keep: list[str]) -> None:
+    """
+    Remove the manifests of versions not in `keep`, and the objects none of the kept versions reference.
+    """
+    referenced = set()
+    for version in keep:
+        referenced.update(read_manifest(version)['files'].values())
+
+    for file in os.listdir(manifests_folder):
+        if file.endswith('.json') and file[:-5] not in keep:
+            os.remove(f'{manifests_folder}{file}')
+    for root, _, files in os.walk(objects_folder):
+        for file in files:
+            if f'{root}/{file}' not in referenced:
+                os.remove(f'{root}/{file}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Manage the snapshots of the published data.')
+    parser.add_argument('command', choices = ['list', 'create', 'rollback'])
+    parser.add_argument('version', nargs = '?', help = 'Version to roll back to. Default the previous version.')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        print(create_snapshot())
+    elif args.command == 'rollback':
+        print(rollback(args.version))
+    else:
+        with open(manifest_file_path) as jsonfile:
+            pointer = json.load(jsonfile)
+        for version in [pointer['version']] + pointer['history']:
+            print(version, read_manifest(version)['created'], '(current)' if version == pointer['version'] else '')
@@ -0,0 +1,104 @@
+import numpy as np
+import shapely
+from functools import lru_cache
+import os
+
+spatial_index_folder = 'data/spatial_index/'
+
+
+# ---- Loading ---- #
+@lru_cache(maxsize = 16)
+def load_spatial_index(year: int) -> dict:
+    """
+    Load a year's spatial index, as written by `spatial_index_creation()` in the ETL, and rebuild its STRtree.
+
+    :param year: Data year.
+    :type year: int
+
+    :return: 'GEO_ID' (tract GEO_IDs, in tree order), 'position' (GEO_ID -> tree position), 'geometries', 'tree',
+             and the adjacency CSR arrays 'indptr' and 'indices'.
+    :rtype: dict
+    """
+    file_path = f'{spatial_index_folder}{year}_spatial_index.npz'
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f'No spatial index for {year}. Run `mastergeometry_creation()` first.')
+
+    with np.load(file_path) as npz:
+        GEO_IDS, WKB, offsets = npz['GEO_ID'], npz['WKB'].tobytes(), npz['WKB_OFFSETS']
+        indptr, indices = npz['INDPTR'], npz['INDICES']
+
+    geometries = shapely.from_wkb([WKB[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])])
+    return {'GEO_ID': GEO_IDS,
+            'position': {int(GEO_ID): i for i, GEO_ID in enumerate(GEO_IDS)},
+            'geometries': geometries,
+            'tree': shapely.STRtree(geometries),
+            'indptr': indptr,
+            'indices': indices}
+
+
+# ---- Queries ---- #
+def point_to_tract(year: int, lat: float, lon: float) -> int | None:
+    """
+    Return the GEO_ID of the tract containing a point, or None if no tract does.
+
+    :param year: Data year.
+    :type year: int
+
+    :param lat: Latitude.
+    :type lat: float
+
+    :param lon: Longitude.
+    :type lon: float
+
+    :return: GEO_ID, e.g. 6037576401.
+    :rtype: int | None
+    """
+    index = load_spatial_index(year)
+    matches = index['tree'].query(shapely.Point(lon, lat), predicate = 'intersects')
+    if len(matches) == 0:
+        return None
+    return int(index['GEO_ID'][matches.min()])
+
+
+def points_to_tracts(year: int, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized `point_to_tract()`: return the GEO_ID of the tract containing each point, or 0 if no tract does.
+    """
+    index = load_spatial_index(year)
+    points, matches = index['tree'].query(shapely.points(lons, lats), predicate = 'intersects')
+    GEO_IDS = np.zeros(len(lats), dtype = np.int64)
+    # Points on a shared boundary match several tracts; keep the first, as `point_to_tract()` does
+    order = np.lexsort((matches, points))
+    matched_points, first = np.unique(points[order], return_index = True)
+    GEO_IDS[matched_points] = index['GEO_ID'][matches[order][first]]
+    return GEO_IDS
+
+
+def k_ring_neighbours(year: int, GEO_ID: int, k: int = 1) -> list[list[int]]:
+    """
+    Return the tracts within `k` steps of adjacency of a tract, ring by ring: the tracts touching it, then the
+    tracts touching those, and so on.
+
+    :param year: Data year.
+    :type year: int
+
+    :param GEO_ID: Tract GEO_ID.
+    :type GEO_ID: int
+
+    :param k: Number of rings. Default '1'.
+    :type k: int
+
+    :return: GEO_IDs of each ring, from the nearest.
+    :rtype: list[list[int]]
+    """
+    index = load_spatial_index(year)
+    indptr, indices = index['indptr'], index['indices']
+    frontier = np.array([index['position'][int(GEO_ID)]])
+    seen = frontier
+    rings = []
+    for _ in range(k):
+        neighbours = np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in frontier]) if len(frontier) else frontier
+        frontier = np.setdiff1d(neighbours, seen)
+        seen = np.union1d(seen, frontier)
+        rings.append(index['GEO_ID'][frontier].tolist())
+    return rings
@@ -0,0 +1,154 @@
+import os, re, sys, gzip, json, shutil, hashlib, argparse
+from snapshots import manifest_file_path, manifests_folder, published_files, read_manifest
+
+# Optional: brotli-compressed copies are only written when `brotli` is installed.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+raw_data_url = 'https://raw.githubusercontent.com/ramindersinghdubb/Contract-Rents-in-LA-County/refs/heads/main/'
+
+compressed_suffixes = ('.html', '.js', '.css', '.json', '.geojson', '.md', '.map')
+
+
+# ---- Helpers ---- #
+def _content_hashed(file_path: str, content: bytes) -> str:
+    """
+    Return `file_path` with a content hash before its extension, e.g. 'bundle.js' -> 'bundle.1a2b3c4d.js'.
+    """
+    stem, ext = os.path.splitext(file_path)
+    if stem.endswith('.min'):
+        stem, ext = stem[:-4], '.min' + ext
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:8]}{ext}'
+
+
+def _rewrite(content: bytes, replacements: dict[str, str]) -> bytes:
+    """
+    Apply every replacement to `content` in a single pass.
+    """
+    if not replacements:
+        return content
+    pattern = re.compile('|'.join(re.escape(old) for old in sorted(replacements, key = len, reverse = True)).encode())
+    return pattern.sub(lambda match: replacements[match.group(0).decode()].encode(), content)
+
+
+def _write(output_folder: str, file_path: str, content: bytes) -> None:
+    """
+    Write a file of the static site, with precompressed copies (gzip, and brotli if available) of text files.
+    """
+    output_path = os.path.join(output_folder, file_path.lstrip('/'))
+    os.makedirs(os.path.dirname(output_path), exist_ok = True)
+    with open(output_path, 'wb') as file:
+        file.write(content)
+
+    if output_path.endswith(compressed_suffixes) and len(content) > 1024:
+        with open(f'{output_path}.gz', 'wb') as file:
+            file.write(gzip.compress(content, compresslevel = 9, mtime = 0))
+        if brotli is not None:
+            with open(f'{output_path}.br', 'wb') as file:
+                file.write(brotli.compress(content))
+
+
+# ---- Static Export ---- #
+def static_export(output_folder: str, prefix: str = '/', bundle_data: bool = True) -> None:
+    """
+    Export the Dash app as a static site, without running a server.
+
+    The index page, layout, dependencies and every registered component bundle (including the async chunks
+    loaded on demand) are rendered directly from the Dash app object. The bundles and assets referenced by the
+    index page are written under content-hashed names, and all paths are rewritten in one pass. Text files are
+    also written precompressed. With `bundle_data`, the data files fetched by the clientside callbacks are copied
+    into the site, and fetched from it rather than from GitHub.
+
+    :param output_folder: Folder to write the static site to. Any existing contents are removed.
+    :type output_folder: str
+
+    :param prefix: URL path the site is served from, e.g. '/Contract-Rents-in-LA-County/'. Default '/'.
+    :type prefix: str
+
+    :param bundle_data: Whether to copy the data files into the site. Default 'True'.
+    :type bundle_data: bool
+    """
+    os.environ['DASH_REQUESTS_PATHNAME_PREFIX'] = prefix
+    os.chdir(repo_folder)
+    sys.path.insert(0, repo_folder)
+    from app import app
+
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+    client = app.server.test_client()
+
+    index = client.get('/').data
+    layout = client.get('/_dash-layout').data
+    dependencies = client.get('/_dash-dependencies').data
+
+    # Files referenced by the index page, under their content-hashed names
+    replacements = {}
+    for url in re.findall(rb'(?:src|href)="([^"]+)"', index):
+        url = url.decode()
+        if not url.startswith(prefix):
+            continue
+        path = url[len(prefix):].split('?')[0]
+        content = client.get('/' + url[len(prefix):]).data
+        if path.startswith('_dash-component-suites/dash/dash-renderer/'):
+            # The renderer requests the layout and dependencies by name; they are written with a .json extension
+            content = _rewrite(content, {'"_dash-layout"': '"_dash-layout.json"', '"_dash-dependencies"': '"_dash-dependencies.json"'})
+        if path.startswith('assets/data.js') and bundle_data:
+            content = _rewrite(content, {raw_data_url: prefix})
+
+        hashed_path = path if path == '_favicon.ico' else _content_hashed(path, content)
+        replacements[url] = prefix + hashed_path
+        _write(output_folder, hashed_path, content)
+
+    _write(output_folder, 'index.html', _rewrite(index, replacements))
+    _write(output_folder, '_dash-layout.json', layout)
+    _write(output_folder, '_dash-dependencies.json', dependencies)
+
+    # Component bundles requested on demand (async chunks and plotly.js), under their plain and fingerprinted names
+    for namespace, paths in app.registered_paths.items():
+        bundles = {path: client.get(f'/_dash-component-suites/{namespace}/{path}').data for path in sorted(paths) if path.endswith('.js')}
+
+        # The chunk loader of a component bundle requests the async chunks in its folder with a fingerprint fixed at build time
+        fingerprints = {}
+        for path, content in bundles.items():
+            for match in re.findall(rb'splice\(1,0,"(v[\w]+)"\)', content):
+                fingerprints.setdefault(os.path.dirname(path), set()).add(match.decode())
+
+        for path, content in bundles.items():
+            _write(output_folder, f'_dash-component-suites/{namespace}/{path}', content)
+            folder, file = os.path.split(path)
+            if file.startswith('async-'):
+                for fingerprint in fingerprints.get(folder, []):
+                    stem, ext = file.split('.', 1)
+                    _write(output_folder, f'_dash-component-suites/{namespace}/{folder}/{stem}.{fingerprint}.{ext}', content)
+
+    # Assets under their plain names (for relative links and the clientside callbacks)
+    for file in os.listdir('assets'):
+        with open(f'assets/{file}', 'rb') as asset:
+            _write(output_folder, f'assets/{file}', asset.read())
+
+    if bundle_data:
+        # The current snapshot (its manifest and objects) when there is one, else the data files as they are
+        if os.path.exists(manifest_file_path):
+            manifest = read_manifest()
+            files = [manifest_file_path, f"{manifests_folder}{manifest['version']}.json"] + sorted(manifest['files'].values())
+        else:
+            files = published_files()
+        for file in files:
+            with open(file, 'rb') as data_file:
+                _write(output_folder, file, data_file.read())
+
+    with open(os.path.join(output_folder, 'export_manifest.json'), 'w') as jsonfile:
+        json.dump({'prefix': prefix, 'files': replacements}, jsonfile, indent = 2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Export the Dash app as a static site.')
+    parser.add_argument('output_folder', help = 'Folder to write the static site to.')
+    parser.add_argument('--prefix', default = '/', help = "URL path the site is served from. Default '/'.")
+    parser.add_argument('--no-data', action = 'store_true', help = 'Fetch data from GitHub rather than bundling it into the site.')
+    args = parser.parse_args()
+
+    static_export(os.path.abspath(args.output_folder), prefix = args.prefix, bundle_data = not args.no_data)
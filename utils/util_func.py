@@ -1,12 +1,16 @@
 import pandas as pd
 import geopandas as gpd
 import numpy as np
+import shapely
 import requests as req
 from datetime import datetime
 from typing import Any, List
-from functools import reduce
+from functools import reduce, cache
+from concurrent.futures import ProcessPoolExecutor
 from warnings import filterwarnings
-import os, shutil, asyncio, unicodedata, json, aiohttp
+from instrumentation import stage, count, observe, count_file_bytes
+from snapshots import manifest_file_path, read_manifest
+import os, shutil, asyncio, unicodedata, json, hashlib, time, aiohttp
 
 filterwarnings('ignore')
 
@@ -14,7 +18,8 @@ filterwarnings('ignore')
 data_folder = f"{os.getcwd()}/data/"
 masterfiles_folder = data_folder + "masterfiles/"
 mastergeometries_folder = data_folder + "mastergeometries/"
-for folder in [data_folder, masterfiles_folder, mastergeometries_folder]:
+spatial_index_folder = data_folder + "spatial_index/"
+for folder in [data_folder, masterfiles_folder, mastergeometries_folder, spatial_index_folder]:
     if not os.path.exists(folder):
         os.makedirs(folder)
 
@@ -56,25 +61,45 @@ def append_counties_to_cities(series, county_series):
             series[series == item] += ' (' + county_series[series == item] + ')'
     return series
 
+# Census Bureau endpoints
+census_api_url = "https://api.census.gov/data"
+census_tiger_url = "https://www2.census.gov/geo/tiger"
+
 # LA County Cities and their FIPS codes
 txt_file_url = "https://www2.census.gov/geo/docs/reference/codes2020/place/st06_ca_place2020.txt"
 
-ca2020 = pd.read_csv(txt_file_url, sep = '|', dtype = {'STATEFP': object, 'PLACEFP': object})
-ca2020['FIPS'] = ca2020['STATEFP'] + ca2020['PLACEFP']
-ca2020['NAME'] = ca2020['PLACENAME'].str.replace(' CDP', "").str.replace(' city', "").str.replace(' town', ' Town')
-ca2020['NAME'] = append_counties_to_cities(ca2020['NAME'], ca2020['COUNTIES'])
-ca2020['ABBREV_NAME'] = [ remove_accents(i).replace(" ", "") for i in ca2020['NAME'] ]
+@cache
+def LA_cities_index() -> pd.DataFrame:
+    """
+    Return the FIPS codes, names and abbreviated names of the 2020 places in Los Angeles County.
+
+    The place list is downloaded on first use, rather than on import.
+
+    :return: Data with 'FIPS', 'NAME' and 'ABBREV_NAME' columns.
+    :rtype: pd.DataFrame
+    """
+    ca2020 = pd.read_csv(txt_file_url, sep = '|', dtype = {'STATEFP': object, 'PLACEFP': object})
+    ca2020['FIPS'] = ca2020['STATEFP'] + ca2020['PLACEFP']
+    ca2020['NAME'] = ca2020['PLACENAME'].str.replace(' CDP', "").str.replace(' city', "").str.replace(' town', ' Town')
+    ca2020['NAME'] = append_counties_to_cities(ca2020['NAME'], ca2020['COUNTIES'])
+    ca2020['ABBREV_NAME'] = [ remove_accents(i).replace(" ", "") for i in ca2020['NAME'] ]
 
-LA_cities_2020 = ca2020[ca2020.COUNTIES.str.contains('Los Angeles County')]
+    LA_cities_2020 = ca2020[ca2020.COUNTIES.str.contains('Los Angeles County')]
 
-index_df = LA_cities_2020[['FIPS', 'NAME', 'ABBREV_NAME']]
+    return LA_cities_2020[['FIPS', 'NAME', 'ABBREV_NAME']]
 
 # ---- Asynchronous Functions for ETL ---- #
 async def _request(url: str):
+    start = time.perf_counter()
     async with aiohttp.ClientSession(trust_env = True) as session:
         async with session.get(url) as resp:
-            if resp.status == 200:
-                return await resp.json()
+            body = await resp.read()
+    observe('http.request_seconds', time.perf_counter() - start)
+    count('http.requests')
+    count(f'http.status.{resp.status}')
+    count('http.bytes_in', len(body))
+    if resp.status == 200:
+        return json.loads(body)
 
 async def url_extract(urls: list[str], batch_size: int):
     results = []
@@ -120,6 +145,7 @@ def ACS_data_extraction(ACS_code: str,
     else:
         spec = ''
     
+    index_df = LA_cities_index()
     dummy_dict = {}
 
     for year in range(initial_year, final_year + 1):
@@ -128,53 +154,60 @@ def ACS_data_extraction(ACS_code: str,
             continue
         
         for FIPS in index_df.FIPS:
-            url = f'https://api.census.gov/data/{year}/acs/acs5{spec}?get=group({ACS_code})&ucgid=pseudo(1600000US{FIPS}$1400000)&key={API_key}'
+            url = f'{census_api_url}/{year}/acs/acs5{spec}?get=group({ACS_code})&ucgid=pseudo(1600000US{FIPS}$1400000)&key={API_key}'
             city_name = index_df.loc[index_df.FIPS == FIPS, 'NAME'].iloc[0]
             dummy_name = index_df.loc[index_df.FIPS == FIPS, 'ABBREV_NAME'].iloc[0]
             dummy_dict[url] = (FIPS, year, city_name, dummy_name)
 
     urls = list( dummy_dict.keys() )
-    try:
-        files = asyncio.run( url_extract(urls, batch_size) )
-    except:
-        files = asyncio.run( url_extract(urls, batch_size) )
+    with stage('ACS_data_extraction.http'):
+        try:
+            files = asyncio.run( url_extract(urls, batch_size) )
+        except:
+            count('http.retries')
+            files = asyncio.run( url_extract(urls, batch_size) )
         
-    df_list = []
-    for file_info, file in zip(dummy_dict.values(), files):
-        if file == None:
-            continue
+    with stage('ACS_data_extraction.parse'):
+        df_list = []
+        for file_info, file in zip(dummy_dict.values(), files):
+            if file == None:
+                count('ACS_data_extraction.dropped_responses')
+                continue
 
-        FIPS, year, city_name, dummy_name = file_info
-        df = pd.DataFrame(file[1:], columns = file[0], index = None)
+            FIPS, year, city_name, dummy_name = file_info
+            df = pd.DataFrame(file[1:], columns = file[0], index = None)
 
-        # Data cleaning
-        try:
-            if df.empty or df.shape[1] == 0:
-                continue
+            # Data cleaning
+            try:
+                if df.empty or df.shape[1] == 0:
+                    count('ACS_data_extraction.empty_responses')
+                    continue
 
-            df = df.drop([col for col in df.columns if col.endswith('A')], axis = 1)
+                df = df.drop([col for col in df.columns if col.endswith('A')], axis = 1)
             
-            df['GEO_ID'] = df['GEO_ID'].str.replace('1400000US', "").astype('object')
-            df['YEAR'] = int(year)
-            df['CITY'] = city_name
-            df['NAME'] = df['NAME'].str.replace(';', ',')
-            df[['TRACT', 'COUNTY', 'STATE']] = df['NAME'].str.split(', ', expand = True)
-            df['ABBREV_NAME'] = dummy_name
+                df['GEO_ID'] = df['GEO_ID'].str.replace('1400000US', "").astype('object')
+                df['YEAR'] = int(year)
+                df['CITY'] = city_name
+                df['NAME'] = df['NAME'].str.replace(';', ',')
+                df[['TRACT', 'COUNTY', 'STATE']] = df['NAME'].str.split(', ', expand = True)
+                df['ABBREV_NAME'] = dummy_name
             
-            value_dict = {-222222222: np.nan, -333333333: np.nan, -555555555: np.nan, -666666666: np.nan, -888888888: np.nan, -999999999: np.nan,
-                            '-222222222': np.nan, '-333333333': np.nan, '-555555555': np.nan, '-666666666': np.nan, '-888888888': np.nan, '-999999999': np.nan}
-            df.replace(value_dict, inplace=True)
-            ordered_columns = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME']
-            df = df[ ordered_columns + [col for col in df.columns if ACS_code in col] ]
+                value_dict = {-222222222: np.nan, -333333333: np.nan, -555555555: np.nan, -666666666: np.nan, -888888888: np.nan, -999999999: np.nan,
+                                '-222222222': np.nan, '-333333333': np.nan, '-555555555': np.nan, '-666666666': np.nan, '-888888888': np.nan, '-999999999': np.nan}
+                df.replace(value_dict, inplace=True)
+                ordered_columns = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME']
+                df = df[ ordered_columns + [col for col in df.columns if ACS_code in col] ]
 
-            df.sort_values(by = ['GEO_ID'], inplace = True)
+                df.sort_values(by = ['GEO_ID'], inplace = True)
 
-            cleaned_file_path = f"{tmp_folder}{ACS_code}_{dummy_name}_{year}_cleaned.csv"
-            df.to_csv(cleaned_file_path, index=False)
-            df_list.extend(df.to_dict('records'))
+                cleaned_file_path = f"{tmp_folder}{ACS_code}_{dummy_name}_{year}_cleaned.csv"
+                df.to_csv(cleaned_file_path, index=False)
+                count_file_bytes('bytes_out', cleaned_file_path)
+                count('ACS_data_extraction.rows', len(df))
+                df_list.extend(df.to_dict('records'))
 
-        except pd.errors.EmptyDataError:
-            continue
+            except pd.errors.EmptyDataError:
+                continue
     
     if len(df_list) == 0:
         pass
@@ -186,12 +219,164 @@ def ACS_data_extraction(ACS_code: str,
             df = dummy_df[dummy_df.YEAR == year]
             ACS_df_file_path = masterfiles_ACS_folder + f'{ACS_code}_{year}_masterfile.csv'
             df.to_csv(ACS_df_file_path, index=False)
+            count_file_bytes('bytes_out', ACS_df_file_path)
     
     shutil.rmtree(tmp_folder)
 
 
+# ---- Display Columns ---- #
+def format_rent_cols(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the formatted 'Median', '75th' and '25th' contract rent columns displayed in the app.
+
+    All three columns are formatted in one vectorized pass: each distinct rent is formatted once and broadcast
+    back, and the ACS top-code sentinels ($2001 through 2014, $3501 afterwards) are masked by year. Whole-dollar
+    rents are shown without decimals, and other (e.g. CPI-adjusted) rents with theirs, e.g. '$1234.56'.
+
+    :param df: Masterfile data containing the B25057, B25058 and B25059 estimates.
+    :type df: pd.DataFrame
+
+    :return: Masterfile data with the formatted display columns.
+    :rtype: pd.DataFrame
+    """
+    df = df.copy()
+    values = df[['B25058_001E', 'B25059_001E', 'B25057_001E']].to_numpy(dtype = float)
+    years = df['YEAR'].to_numpy()[:, None]
+
+    uniques, inverse = np.unique(np.nan_to_num(values, nan = -1), return_inverse = True)
+    labels = np.array([f'${u:.0f}' if u == int(u) else f'${u}' for u in uniques], dtype = object)
+    strings = labels[inverse.reshape(values.shape)]
+
+    strings[np.isnan(values)] = 'Not Available!'
+    strings[(values == 2001) & (years <= 2014)] = 'Not available. Exceeds $2000!'
+    strings[(values == 3501) & (years > 2014)] = 'Not available. Exceeds $3500!'
+
+    df[['Median', '75th', '25th']] = strings
+    return df
+
+
+# ---- Masterfile Writer ---- #
+def _write_partition(ABBREV_NAME: str, dummy_df: pd.DataFrame, staging_folder: str) -> list[tuple[str, int]]:
+    """
+    Format and write one place partition (CSV and JSON) into the staging folder. Run in the worker processes
+    of `write_masterfiles()`.
+
+    :return: Names and sizes of the written files.
+    :rtype: list[tuple[str, int]]
+    """
+    if {'B25057_001E', 'B25058_001E', 'B25059_001E'}.issubset(dummy_df.columns):
+        dummy_df = format_rent_cols(dummy_df)
+    dummy_df = dummy_df.sort_values(by = ['YEAR', 'GEO_ID'], ignore_index = True)
+
+    dummy_df.to_csv(f'{staging_folder}{ABBREV_NAME}_masterfile.csv', index = False)
+    dummy_df.to_json(f'{staging_folder}{ABBREV_NAME}_masterfile.json', orient='records')
+    file_names = [f'{ABBREV_NAME}_masterfile.csv', f'{ABBREV_NAME}_masterfile.json']
+    return [(file_name, os.path.getsize(f'{staging_folder}{file_name}')) for file_name in file_names]
+
+
+def write_masterfiles(df: pd.DataFrame, n_workers: int | None = None) -> None:
+    """
+    Write the place-segmented masterfiles (CSV and JSON) for the merged dataset.
+
+    The data is split by place up front, and each partition is formatted and written exactly once, into a
+    versioned staging folder, by a pool of `n_workers` processes (each task is sent only its own partition).
+    The staged files are only swapped into `masterfiles_folder` once every partition has been written, and
+    each swap is an atomic `os.replace`, so no masterfile is ever left partially written. The set of files as a
+    whole is not swapped atomically: a run failing partway through the swap leaves a mix of old and new files.
+    Masterfiles of places no longer in `df` are removed after the swap.
+
+    :param df: Merged masterfile data for all places.
+    :type df: pd.DataFrame
+
+    :param n_workers: Number of worker processes; '1' writes in this process. Default 'None' (one per CPU core).
+    :type n_workers: int | None
+    """
+    staging_folder = data_folder + f"tmp/masterfiles_{datetime.now().strftime('%Y%m%d%H%M%S%f')}/"
+    os.makedirs(staging_folder)
+    n_workers = n_workers or os.cpu_count()
+
+    try:
+        partitions = list(df.groupby('ABBREV_NAME', sort = False))
+        if n_workers == 1:
+            results = [_write_partition(ABBREV_NAME, dummy_df, staging_folder) for ABBREV_NAME, dummy_df in partitions]
+        else:
+            with ProcessPoolExecutor(max_workers = n_workers) as executor:
+                results = list(executor.map(_write_partition,
+                                            [ABBREV_NAME for ABBREV_NAME, _ in partitions],
+                                            [dummy_df for _, dummy_df in partitions],
+                                            [staging_folder] * len(partitions),
+                                            chunksize = max(1, len(partitions) // (4 * n_workers))))
+
+        file_names = []
+        for result in results:
+            count('write_masterfiles.partitions')
+            for file_name, size in result:
+                count('bytes_out', size)
+                file_names.append(file_name)
+
+        for file_name in file_names:
+            os.replace(f'{staging_folder}{file_name}', f'{masterfiles_folder}{file_name}')
+
+        # ---- Remove the masterfiles of places no longer in the data ---- #
+        for file_name in os.listdir(masterfiles_folder):
+            if file_name.endswith(('_masterfile.csv', '_masterfile.json')) and file_name not in file_names:
+                os.remove(f'{masterfiles_folder}{file_name}')
+    finally:
+        shutil.rmtree(staging_folder, ignore_errors = True)
+
+
+# ---- Availability Writer ---- #
+def tract_vintages(df: pd.DataFrame, min_overlap: float = 0.9) -> list[list[int]]:
+    """
+    Group the years of the data into tract vintages (the tracts of a decennial census): a year starts a new
+    vintage when fewer than `min_overlap` of its tracts (GEO_IDs) were in the data the year before.
+
+    :param df: Masterfile data with 'YEAR' and 'GEO_ID' columns.
+    :type df: pd.DataFrame
+
+    :param min_overlap: Least share of a year's tracts in the previous year for both to be of a vintage. Default '0.9'.
+    :type min_overlap: float
+
+    :return: Years of each vintage, e.g. [[2010, ..., 2019], [2020, ...]]; a vintage is named by its first year.
+    :rtype: list[list[int]]
+    """
+    vintages, previous = [], None
+    for YEAR, GEO_IDS in df[['YEAR', 'GEO_ID']].drop_duplicates().groupby('YEAR')['GEO_ID'].apply(set).items():
+        if previous is None or len(GEO_IDS & previous) < min_overlap * len(GEO_IDS):
+            vintages.append([])
+        vintages[-1].append(int(YEAR))
+        previous = GEO_IDS
+    return vintages
+
+
+def write_availability(df: pd.DataFrame) -> None:
+    """
+    Write the compact year availability of each place ('availability.json'), from which the app builds its
+    place and year dropdown options, along with the tract vintages of the years (see `tract_vintages()`).
+
+    Each place is stored as [CITY, ABBREV_NAME, YEARS], where bit i of YEARS is set if the place has data for
+    the year BASE_YEAR + i.
+
+    :param df: Merged masterfile data for all places.
+    :type df: pd.DataFrame
+    """
+    BASE_YEAR = int(df['YEAR'].min())
+    years_df = df[['ABBREV_NAME', 'CITY', 'YEAR']].drop_duplicates(subset = ['ABBREV_NAME', 'YEAR'])
+    years_df = years_df.assign(BIT = np.left_shift(1, years_df['YEAR'] - BASE_YEAR))
+    places_df = years_df.groupby('ABBREV_NAME', sort = False).agg(CITY = ('CITY', 'first'), YEARS = ('BIT', 'sum'))
+
+    json_dict = {'BASE_YEAR': BASE_YEAR,
+                 'PLACES': [[CITY, ABBREV_NAME, int(YEARS)] for ABBREV_NAME, CITY, YEARS in places_df.itertuples()],
+                 'VINTAGES': tract_vintages(df)}
+
+    file_path = f'{data_folder}availability.json'
+    with open(f'{file_path}.tmp', 'w') as jsonfile:
+        json.dump(json_dict, jsonfile, separators = (',', ':'))
+    os.replace(f'{file_path}.tmp', file_path)
+
+
 # ---- Masterfile Function ---- #
-def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: int = 250):
+def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: int = 250, n_workers: int | None = None):
     """
     Create place-segmented masterfiles on the specified ACS codes.
     
@@ -203,6 +388,9 @@ def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: in
 
     :param batch_size: Batch size for rate-checking the asynchronous url extraction. Default '250'.
     :type batch_size: int
+
+    :param n_workers: Number of processes writing the masterfiles. Default 'None' (one per CPU core).
+    :type n_workers: int | None
     """
     df_list = []
     
@@ -210,7 +398,8 @@ def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: in
     for ACS_code in ACS_codes:
         
         # Data extraction
-        ACS_data_extraction(ACS_code, API_key, batch_size = batch_size)
+        with stage('ACS_data_extraction'):
+            ACS_data_extraction(ACS_code, API_key, batch_size = batch_size)
 
         # Data concatenation
         dummy_list = []
@@ -221,19 +410,17 @@ def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: in
         df_list.append( dummy_df )
 
     # Segmentation
-    df = reduce(lambda left, right: pd.merge(left, right, on = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME'], how = 'left'),
-                df_list)
-    for ABBREV_NAME in df.ABBREV_NAME.unique():
-        dummy_df = df[df.ABBREV_NAME == ABBREV_NAME]
-
-        CSV_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.csv'
-        dummy_df.to_csv(CSV_file_path, index = False)
-
-        JSON_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.json'
-        dummy_df.to_json(JSON_file_path, orient='records')
+    with stage('masterfile_creation.segmentation'):
+        df = reduce(lambda left, right: pd.merge(left, right, on = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME'], how = 'left'),
+                    df_list)
+        write_masterfiles(df, n_workers = n_workers)
     
+    # Compact year availability of each place, for the app's dropdown options
+    write_availability(df)
+
     # Reference TXT file containing the earliest and most recent years of data for each city
-    with open(f'{data_folder}reference.txt', 'w') as txtfile:
+    reference_file_path = f'{data_folder}reference.txt'
+    with open(f'{reference_file_path}.tmp', 'w') as txtfile:
         txtfile.write("CITY|ABBREV_NAME|INITIAL_YEAR|RECENT_YEAR")
         txtfile.write("\n")
         for ABBREV_NAME in df['ABBREV_NAME'].unique():
@@ -244,12 +431,486 @@ def masterfile_creation(ACS_codes: str | List[str], API_key: str, batch_size: in
             content = '|'.join([CITY, ABBREV_NAME, str(INT_YEAR), str(REC_YEAR)])
             txtfile.write(content)
             txtfile.write('\n')
+    os.replace(f'{reference_file_path}.tmp', reference_file_path)
+
+
+# ---- Validation Function ---- #
+# Expected masterfile columns and dtype kinds
+masterfile_schema = {'YEAR': 'i', 'GEO_ID': 'i', 'TRACT': 'O', 'CITY': 'O', 'COUNTY': 'O', 'STATE': 'O', 'ABBREV_NAME': 'O',
+                     'B25057_001E': 'f', 'B25057_001M': 'f', 'B25058_001E': 'f', 'B25058_001M': 'f', 'B25059_001E': 'f', 'B25059_001M': 'f',
+                     'Median': 'O', '75th': 'O', '25th': 'O'}
+
+
+def _check(errors: list, warnings: list, max_items: int = 100) -> dict:
+    return {'status': 'failed' if errors else 'warning' if warnings else 'passed',
+            'n_errors': len(errors), 'errors': errors[:max_items],
+            'n_warnings': len(warnings), 'warnings': warnings[:max_items]}
+
+
+def _published_tract_counts() -> pd.DataFrame | None:
+    """
+    Return the tract counts per place and year of the published data (from its 'rent_statistics.json'), or None.
+    """
+    file_path = f'{data_folder}rent_statistics.json'
+    if os.path.exists(manifest_file_path):
+        file_path = read_manifest()['files'].get('data/rent_statistics.json', file_path)
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path) as jsonfile:
+        json_dict = json.load(jsonfile)
+    return pd.DataFrame(json_dict['data'], columns = json_dict['columns'])[['ABBREV_NAME', 'YEAR', 'TRACTS']]
+
+
+def validate_masterfiles(k_moe: float = 3.0,
+                         max_tract_drop: float = 0.1,
+                         max_jump_share: float = 0.01,
+                         report_file_path: str = 'validation_report.json') -> dict:
+    """
+    Validate the masterfiles before they are published, and write the results to a report.
+
+    All checks are vectorized over the full history at once:
+        - schema: every masterfile has the expected columns and dtypes, with no missing or duplicated keys;
+        - sentinels: no negative ACS values (Census annotation codes missing from `value_dict`), and no estimates
+          above the year's top code ($2001 through 2014, $3501 afterwards);
+        - tract_counts: no place (or the county) loses more than `max_tract_drop` of its tracts from one year to
+          the next within a tract vintage, or against the published data for the same year;
+        - rent_jumps: year-over-year changes of a tract's estimates beyond `k_moe` times their combined MOE are
+          listed, and fail the check when they make up more than `max_jump_share` of a year's tracts.
+
+    Failed checks raise, so that nothing is published; warnings are only reported. Note that
+    `masterfile_creation()` must be called prior to this.
+
+    :param k_moe: Multiple of the combined MOE beyond which a year-over-year change is a jump. Default '3.0'.
+    :type k_moe: float
+
+    :param max_tract_drop: Largest share of a place's tracts that may drop out. Default '0.1'.
+    :type max_tract_drop: float
+
+    :param max_jump_share: Largest share of a year's tracts with jumps. Default '0.01'.
+    :type max_jump_share: float
+
+    :param report_file_path: Path of the validation report. Default 'validation_report.json'.
+    :type report_file_path: str
+
+    :return: Validation report.
+    :rtype: dict
+    """
+    start = time.perf_counter()
+    checks = {}
+
+    # Schema
+    errors, df_list = [], []
+    for file in sorted(os.listdir(masterfiles_folder)):
+        if not file.endswith('_masterfile.csv'):
+            continue
+        dummy_df = pd.read_csv(f'{masterfiles_folder}{file}')
+        missing = [col for col in masterfile_schema if col not in dummy_df.columns]
+        unexpected = [col for col in dummy_df.columns if col not in masterfile_schema]
+        if missing or unexpected:
+            errors.append({'file': file, 'missing_columns': missing, 'unexpected_columns': unexpected})
+        for col, kind in masterfile_schema.items():
+            # Integer columns with missing values are read as floats, so only the missing values are reported then
+            if col in dummy_df.columns and dummy_df[col].dtype.kind != kind and not (kind == 'f' and dummy_df[col].dtype.kind == 'i') \
+                    and not (kind == 'i' and dummy_df[col].isna().any()):
+                errors.append({'file': file, 'column': col, 'dtype': str(dummy_df[col].dtype)})
+        # Numeric columns are coerced (invalid values becoming missing), so that the other checks still run
+        dummy_df = dummy_df[[col for col in masterfile_schema if col in dummy_df.columns]]
+        df_list.append(dummy_df.apply(lambda col: pd.to_numeric(col, errors = 'coerce') if masterfile_schema[col.name] != 'O' else col))
+    if not df_list:
+        raise FileNotFoundError(f'No masterfiles in {masterfiles_folder}. Run `masterfile_creation()` first.')
+    df = pd.concat(df_list, ignore_index = True)
+
+    keys = ['YEAR', 'GEO_ID', 'ABBREV_NAME']
+    for col in keys:
+        if col in df.columns and df[col].isna().any():
+            errors.append({'column': col, 'missing_values': int(df[col].isna().sum())})
+    df = df.dropna(subset = [col for col in keys if col in df.columns])
+    if set(keys).issubset(df.columns) and df.duplicated(subset = keys).any():
+        errors.append({'duplicated_rows': int(df.duplicated(subset = keys).sum())})
+    checks['schema'] = _check(errors, [])
+
+    # Sentinels
+    errors = []
+    ACS_cols = [col for col in masterfile_schema if col[-2:] in ('1E', '1M') and col in df.columns]
+    values = df[ACS_cols].to_numpy(dtype = float)
+    top_codes = np.where(df['YEAR'].to_numpy() <= 2014, 2001, 3501)[:, None]
+    for name, flagged in [('negative', values < 0),
+                          ('above_top_code', (values > top_codes) & np.array([col.endswith('E') for col in ACS_cols]))]:
+        rows, cols = np.nonzero(flagged)
+        if len(rows):
+            flagged_df = pd.DataFrame({'COLUMN': np.array(ACS_cols)[cols], 'YEAR': df['YEAR'].to_numpy()[rows],
+                                       'VALUE': values[rows, cols]})
+            for (col, YEAR, VALUE), n in flagged_df.value_counts().sort_index().items():
+                errors.append({'check': name, 'column': col, 'year': int(YEAR), 'value': float(VALUE), 'rows': int(n)})
+    checks['sentinels'] = _check(errors, [])
+
+    # Tract counts, per place and for the county (each tract counted once)
+    errors, warnings = [], []
+    county_df = df.drop_duplicates(subset = ['YEAR', 'GEO_ID']).assign(ABBREV_NAME = 'LosAngelesCounty')
+    counts = pd.concat([df, county_df]).groupby(['ABBREV_NAME', 'YEAR']).size().unstack(fill_value = 0)
+    previous = counts.shift(1, axis = 1)
+    vintage_of = {YEAR: years[0] for years in tract_vintages(df) for YEAR in years}
+    YEARS = counts.columns.to_series()
+    same_vintage = YEARS.map(vintage_of) == YEARS.shift(1).map(vintage_of)
+    drop = (1 - counts / previous).where(previous > 0)
+    for (ABBREV_NAME, YEAR), value in drop.stack().items():
+        if value > max_tract_drop:
+            item = {'place': ABBREV_NAME, 'year': int(YEAR), 'tracts': int(counts.at[ABBREV_NAME, YEAR]),
+                    'previous_year_tracts': int(previous.at[ABBREV_NAME, YEAR])}
+            # Tracts are redrawn with each decennial census, so counts may change between vintages
+            (errors if same_vintage[YEAR] else warnings).append(item)
+
+    published_df = _published_tract_counts()
+    if published_df is not None:
+        published_df = published_df.merge(counts.stack().rename('CURRENT').reset_index(), on = ['ABBREV_NAME', 'YEAR'], how = 'left')
+        published_df['CURRENT'] = published_df['CURRENT'].fillna(0)
+        for ABBREV_NAME, YEAR, TRACTS, CURRENT in published_df.itertuples(index = False):
+            if CURRENT < (1 - max_tract_drop) * TRACTS:
+                errors.append({'place': ABBREV_NAME, 'year': int(YEAR), 'tracts': int(CURRENT), 'published_tracts': int(TRACTS)})
+    checks['tract_counts'] = _check(errors, warnings)
+
+    # Rent jumps beyond k x MOE between consecutive years of a tract, with top-coded estimates masked
+    errors, warnings = [], []
+    tract_df = df.drop_duplicates(subset = ['YEAR', 'GEO_ID']).sort_values(by = ['GEO_ID', 'YEAR'], ignore_index = True)
+    consecutive = (tract_df['GEO_ID'].diff() == 0) & (tract_df['YEAR'].diff() == 1)
+    top_codes = np.where(tract_df['YEAR'] <= 2014, 2001, 3501)
+    for ACS_code in ['B25057', 'B25058', 'B25059']:
+        if f'{ACS_code}_001E' not in tract_df.columns or f'{ACS_code}_001M' not in tract_df.columns:
+            continue
+        E = tract_df[f'{ACS_code}_001E'].mask(tract_df[f'{ACS_code}_001E'] == top_codes)
+        M = tract_df[f'{ACS_code}_001M']
+        change = E - E.shift(1)
+        MOE = np.sqrt(M ** 2 + M.shift(1) ** 2)
+        comparable = consecutive & change.notna() & MOE.notna()
+        jumps = comparable & (change.abs() > k_moe * MOE)
+
+        for i in np.flatnonzero(jumps):
+            warnings.append({'column': f'{ACS_code}_001E', 'geo_id': int(tract_df.at[i, 'GEO_ID']), 'year': int(tract_df.at[i, 'YEAR']),
+                             'previous': float(E[i - 1]), 'current': float(E[i]), 'moe': round(float(MOE[i]), 1)})
+        shares = jumps.groupby(tract_df['YEAR']).sum() / comparable.groupby(tract_df['YEAR']).sum()
+        for YEAR, share in shares.items():
+            if share > max_jump_share:
+                errors.append({'column': f'{ACS_code}_001E', 'year': int(YEAR), 'jump_share': round(float(share), 4)})
+    checks['rent_jumps'] = _check(errors, warnings)
+
+    report = {'created': datetime.now().isoformat(timespec = 'seconds'),
+              'passed': all(check['status'] != 'failed' for check in checks.values()),
+              'rows': len(df),
+              'seconds': round(time.perf_counter() - start, 3),
+              'checks': checks}
+    with open(f'{report_file_path}.tmp', 'w') as jsonfile:
+        json.dump(report, jsonfile, indent = 1)
+    os.replace(f'{report_file_path}.tmp', report_file_path)
+
+    if not report['passed']:
+        failed = [name for name, check in checks.items() if check['status'] == 'failed']
+        raise ValueError(f"Masterfile validation failed ({', '.join(failed)}); see {report_file_path}.")
+    return report
+
+
+# ---- Rent Statistics Function ---- #
+def _rent_statistics(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate tract median contract rents (B25058) into year-indexed summary statistics for each `ABBREV_NAME`.
+
+    Top-coded estimates ($2001 through 2014, $3501 afterwards) are not rents, so they are left out of the mean and
+    percentiles, and reported as a share of the tracts instead. The mean and its MOE are taken over the same tracts
+    (those with an estimate and its MOE).
+
+    :param df: Masterfile data with 'ABBREV_NAME', 'CITY', 'YEAR', 'B25058_001E' and 'B25058_001M' columns.
+    :type df: pd.DataFrame
+
+    :return: One row per `ABBREV_NAME` and year.
+    :rtype: pd.DataFrame
+    """
+    reported = df['B25058_001E'].notna()
+    top_coded = ((df['B25058_001E'] == 2001) & (df['YEAR'] <= 2014)) | ((df['B25058_001E'] == 3501) & (df['YEAR'] > 2014))
+    RENT = df['B25058_001E'].mask(top_coded)
+    MEAN_RENT = RENT.where(df['B25058_001M'].notna())
+    df = df.assign(RENT = RENT,
+                   MEAN_RENT = MEAN_RENT,
+                   MOE_SQ = (df['B25058_001M'] ** 2).where(MEAN_RENT.notna()),
+                   TOP_CODED = top_coded.where(reported).astype(float),
+                   ABOVE_2000 = (df['B25058_001E'] > 2000).where(reported).astype(float))
+    grouped = df.groupby(['ABBREV_NAME', 'YEAR'], sort = True)
+
+    stats_df = grouped.agg(CITY = ('CITY', 'first'),
+                           TRACTS = ('GEO_ID', 'nunique'),
+                           REPORTED = ('B25058_001E', 'count'),
+                           MEAN = ('MEAN_RENT', 'mean'),
+                           MOE_SQ = ('MOE_SQ', 'sum'),
+                           MOE_COUNT = ('MOE_SQ', 'count'),
+                           SHARE_TOP_CODED = ('TOP_CODED', 'mean'),
+                           SHARE_ABOVE_2000 = ('ABOVE_2000', 'mean'))
+    quantiles_df = grouped['RENT'].quantile([0.25, 0.5, 0.75]).unstack()
+    quantiles_df.columns = ['P25', 'MEDIAN', 'P75']
+    stats_df = stats_df.join(quantiles_df).reset_index()
+
+    # MOE of a mean of estimates: sqrt(sum of squared MOEs) / n (ACS approximation for derived estimates)
+    stats_df['MEAN_MOE'] = np.sqrt(stats_df['MOE_SQ']) / stats_df['MOE_COUNT'].where(stats_df['MOE_COUNT'] > 0)
+
+    # Year-over-year changes, only between consecutive years of the same place
+    previous_df = stats_df.groupby('ABBREV_NAME')[['YEAR', 'MEDIAN', 'MEAN', 'MEAN_MOE']].shift(1)
+    consecutive = previous_df['YEAR'] == stats_df['YEAR'] - 1
+    stats_df['YOY_MEDIAN_CHANGE'] = (stats_df['MEDIAN'] - previous_df['MEDIAN']).where(consecutive)
+    stats_df['YOY_MEAN_CHANGE'] = (stats_df['MEAN'] - previous_df['MEAN']).where(consecutive)
+    stats_df['YOY_MEAN_CHANGE_MOE'] = np.sqrt(stats_df['MEAN_MOE'] ** 2 + previous_df['MEAN_MOE'] ** 2).where(consecutive)
+
+    return stats_df.drop(['MOE_SQ', 'MOE_COUNT'], axis = 1)
+
+
+def rent_statistics_creation():
+    """
+    Create the place x year and county x year contract rent statistics for the previously generated masterfiles.
+
+    Statistics are taken over tract median contract rents: their median, 25th and 75th percentiles, mean (with
+    its margin of error), the shares of tracts top-coded and above $2000, and year-over-year changes. Tracts are weighted
+    equally, as the masterfiles carry no renter counts. County rows (ABBREV_NAME 'LosAngelesCounty') count each
+    tract once, even if it falls within several places.
+
+    Note that `masterfile_creation()` must be called prior to this.
+    """
+    files = [file for file in os.listdir(masterfiles_folder) if file.endswith('masterfile.csv')]
+    df_list = []
+    for file in files:
+        df_list.append( pd.read_csv(f'{masterfiles_folder}{file}',
+                                    usecols = ['YEAR', 'GEO_ID', 'CITY', 'ABBREV_NAME', 'B25058_001E', 'B25058_001M']) )
+    df = pd.concat(df_list, ignore_index = True)
+
+    county_df = df.drop_duplicates(subset = ['YEAR', 'GEO_ID']).assign(ABBREV_NAME = 'LosAngelesCounty',
+                                                                        CITY = 'Los Angeles County')
+    stats_df = pd.concat([_rent_statistics(df), _rent_statistics(county_df)], ignore_index = True)
+    stats_df = stats_df.round({'MEAN': 1, 'MEAN_MOE': 1, 'SHARE_TOP_CODED': 4, 'SHARE_ABOVE_2000': 4, 'P25': 1, 'MEDIAN': 1, 'P75': 1,
+                               'YOY_MEDIAN_CHANGE': 1, 'YOY_MEAN_CHANGE': 1, 'YOY_MEAN_CHANGE_MOE': 1})
+
+    file_path = f'{data_folder}rent_statistics.json'
+    stats_df.to_json(f'{file_path}.tmp', orient = 'split', index = False)
+    os.replace(f'{file_path}.tmp', file_path)
+
+
+# ---- Significance Function ---- #
+def rent_change_significance(z_critical: float = 1.645) -> None:
+    """
+    Test, for every tract and every pair of years, whether the change in median contract rent (B25058) is
+    statistically significant, per the ACS significance test
+
+        Z = (E2 - E1) / sqrt(SE1^2 + SE2^2),  SE = MOE / 1.645.
+
+    The tract x year estimates and margins of error are laid out as dense matrices and every pair of years is
+    tested at once by broadcasting. Top-coded and missing estimates (which carry no MOE) are never significant.
+    The Z-scores are cached in 'rent_significance.npz' alongside a hash of their inputs (the data and `z_critical`),
+    and are only recomputed when either changes. The years with a significant increase are written per year to
+    'significance/{YEAR}_significance.json' for the app.
+
+    Note that the ACS discourages comparing overlapping 5-year estimates; the app leaves the choice of base year
+    to the user. `masterfile_creation()` must be called prior to this.
+
+    :param z_critical: Critical value for the test. Default '1.645' (90% confidence, as with ACS MOEs).
+    :type z_critical: float
+    """
+    files = [file for file in os.listdir(masterfiles_folder) if file.endswith('masterfile.csv')]
+    df_list = []
+    for file in files:
+        df_list.append( pd.read_csv(f'{masterfiles_folder}{file}', usecols = ['YEAR', 'GEO_ID', 'B25058_001E', 'B25058_001M']) )
+    df = pd.concat(df_list, ignore_index = True).drop_duplicates(subset = ['YEAR', 'GEO_ID'])
+
+    # Tract x year matrices
+    tract_idx, GEO_IDS = pd.factorize(df['GEO_ID'], sort = True)
+    year_idx, YEARS = pd.factorize(df['YEAR'], sort = True)
+    E = np.full((len(GEO_IDS), len(YEARS)), np.nan)
+    M = np.full((len(GEO_IDS), len(YEARS)), np.nan)
+    E[tract_idx, year_idx] = df['B25058_001E']
+    M[tract_idx, year_idx] = df['B25058_001M']
+
+    # The outputs depend on the data and on the test's parameters, so both are hashed
+    cache_file_path = f'{data_folder}rent_significance.npz'
+    significance_folder = data_folder + 'significance/'
+    input_hash = hashlib.sha256(np.ascontiguousarray(GEO_IDS).tobytes() + np.ascontiguousarray(YEARS).tobytes()
+                                + E.tobytes() + M.tobytes() + repr({'z_critical': float(z_critical)}).encode()).hexdigest()
+    if os.path.exists(cache_file_path):
+        with np.load(cache_file_path) as cache:
+            if str(cache['INPUT_HASH']) == input_hash \
+                    and all(os.path.exists(f'{significance_folder}{YEAR}_significance.json') for YEAR in YEARS):
+                return
+
+    # Z[tract, base year, year] for every pair of years
+    SE = M / 1.645
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        Z = (E[:, None, :] - E[:, :, None]) / np.sqrt(SE[:, None, :] ** 2 + SE[:, :, None] ** 2)
+    Z = Z.astype(np.float32)
+
+    np.savez_compressed(f'{cache_file_path[:-4]}.tmp.npz', GEO_ID = GEO_IDS, YEAR = YEARS, Z = Z, INPUT_HASH = input_hash)
+    os.replace(f'{cache_file_path[:-4]}.tmp.npz', cache_file_path)
+
+    # Per-year lookup of the earlier years against which each tract's rent increased significantly
+    if not os.path.exists(significance_folder):
+        os.makedirs(significance_folder)
+
+    increases = Z > z_critical
+    for j, YEAR in enumerate(YEARS):
+        tracts, base_years = np.nonzero(increases[:, :j, j])
+        json_dict = {}
+        for tract, base_year in zip(tracts, base_years):
+            json_dict.setdefault(str(GEO_IDS[tract]), []).append(int(YEARS[base_year]))
+
+        with open(f'{significance_folder}{YEAR}_significance.json', 'w') as jsonfile:
+            json.dump(json_dict, jsonfile)
+
+
+# ---- Tract Trends Function ---- #
+def _nearest_neighbours(X: np.ndarray, k: int, chunk_size: int = 2048) -> np.ndarray:
+    """
+    Return the indices of the `k` nearest rows (by Euclidean distance, excluding the row itself) of each row of `X`,
+    nearest first. Distances are computed by brute force in chunks of rows, so memory stays at `chunk_size` x `len(X)`.
+    """
+    squared_norms = (X ** 2).sum(axis = 1)
+    neighbours = np.empty((len(X), k), dtype = np.int64)
+    for start in range(0, len(X), chunk_size):
+        stop = min(start + chunk_size, len(X))
+        D = squared_norms[start:stop, None] + squared_norms[None, :] - 2 * X[start:stop] @ X.T
+        D[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest = np.argpartition(D, k - 1, axis = 1)[:, :k]
+        order = np.take_along_axis(D, nearest, axis = 1).argsort(axis = 1)
+        neighbours[start:stop] = np.take_along_axis(nearest, order, axis = 1)
+    return neighbours
+
+
+def tract_trend_similarity(k: int = 5, recent_years: int = 3, min_years: int = 5) -> None:
+    """
+    Compute rent trend features for every tract, and precompute the tracts with the most similar trends.
+
+    Tract median contract rents (B25058) are laid out as a tract x year matrix of log rents, with top-coded and
+    missing estimates left out. From it, each tract gets:
+
+        CAGR          compound annual growth rate between its first and last reported years,
+        VOLATILITY    standard deviation of its year-over-year log changes,
+        ACCELERATION  mean year-over-year log change over its last `recent_years` changes, less that over its earlier ones.
+
+    The features are standardized across tracts, and the `k` nearest tracts of each tract are found by a chunked,
+    vectorized brute-force search. The results are written to 'tract_trends.json', keyed by GEO_ID, so the app
+    answers similar-tract queries with a lookup.
+
+    Note that `masterfile_creation()` must be called prior to this.
+
+    :param k: Number of similar tracts per tract. Default '5'.
+    :type k: int
+
+    :param recent_years: Number of recent year-over-year changes for the acceleration. Default '3'.
+    :type recent_years: int
+
+    :param min_years: Least number of reported years for a tract to be included. Default '5'.
+    :type min_years: int
+    """
+    files = [file for file in os.listdir(masterfiles_folder) if file.endswith('masterfile.csv')]
+    df_list = []
+    for file in files:
+        df_list.append( pd.read_csv(f'{masterfiles_folder}{file}', usecols = ['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'ABBREV_NAME', 'B25058_001E']) )
+    df = pd.concat(df_list, ignore_index = True).drop_duplicates(subset = ['YEAR', 'GEO_ID'])
+
+    top_coded = ((df['B25058_001E'] == 2001) & (df['YEAR'] <= 2014)) | ((df['B25058_001E'] == 3501) & (df['YEAR'] > 2014))
+    df = df.assign(B25058_001E = df['B25058_001E'].mask(top_coded))
+
+    # Tract x year matrix of log rents
+    tract_idx, GEO_IDS = pd.factorize(df['GEO_ID'], sort = True)
+    year_idx, YEARS = pd.factorize(df['YEAR'], sort = True)
+    L = np.full((len(GEO_IDS), len(YEARS)), np.nan)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        L[tract_idx, year_idx] = np.log(df['B25058_001E'].where(df['B25058_001E'] > 0))
+    reported = ~np.isnan(L)
+
+    # Compound annual growth rate between the first and last reported years
+    YEARS = np.asarray(YEARS)
+    first = reported.argmax(axis = 1)
+    last = len(YEARS) - 1 - reported[:, ::-1].argmax(axis = 1)
+    rows = np.arange(len(GEO_IDS))
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        CAGR = np.exp((L[rows, last] - L[rows, first]) / (YEARS[last] - YEARS[first])) - 1
+
+    # Year-over-year log changes, only between consecutive years
+    changes = np.diff(L, axis = 1)
+    changes[:, np.diff(YEARS) != 1] = np.nan
+    with np.errstate(invalid = 'ignore'):
+        VOLATILITY = np.nanstd(changes, axis = 1)
+
+    # Each tract's own last `recent_years` changes (not the matrix's last columns: tracts may end before its last year)
+    changed = ~np.isnan(changes)
+    recent = changed & (np.cumsum(changed[:, ::-1], axis = 1)[:, ::-1] <= recent_years)
+    with np.errstate(invalid = 'ignore'):
+        ACCELERATION = np.nanmean(np.where(recent, changes, np.nan), axis = 1) - np.nanmean(np.where(changed & ~recent, changes, np.nan), axis = 1)
+
+    features = np.column_stack([CAGR, VOLATILITY, ACCELERATION])
+    included = (reported.sum(axis = 1) >= min_years) & np.isfinite(features).all(axis = 1)
+    GEO_IDS, features = np.asarray(GEO_IDS)[included], features[included]
+
+    # Similar tracts by standardized features (a constant feature is left unscaled, as it cannot tell tracts apart)
+    if len(features) < 2:
+        neighbours = np.empty((len(features), 0), dtype = np.int64)
+    else:
+        std = features.std(axis = 0)
+        std[std == 0] = 1
+        Z = (features - features.mean(axis = 0)) / std
+        neighbours = _nearest_neighbours(Z, min(k, len(Z) - 1))
+
+    # Names of each tract, as of its most recent year
+    names_df = df.sort_values('YEAR').drop_duplicates(subset = 'GEO_ID', keep = 'last').set_index('GEO_ID').loc[GEO_IDS]
+
+    json_dict = {'COLUMNS': ['TRACT', 'CITY', 'ABBREV_NAME', 'CAGR', 'VOLATILITY', 'ACCELERATION', 'SIMILAR'], 'TRACTS': {}}
+    for i, GEO_ID in enumerate(GEO_IDS):
+        json_dict['TRACTS'][str(GEO_ID)] = [names_df['TRACT'].iat[i], names_df['CITY'].iat[i], names_df['ABBREV_NAME'].iat[i],
+                                            *np.round(features[i], 4).tolist(), [str(GEO_IDS[j]) for j in neighbours[i]]]
+
+    file_path = f'{data_folder}tract_trends.json'
+    with open(f'{file_path}.tmp', 'w') as jsonfile:
+        json.dump(json_dict, jsonfile, separators = (',', ':'))
+    os.replace(f'{file_path}.tmp', file_path)
+
+
+# ---- Spatial Index ---- #
+def spatial_index_creation(gdf: gpd.GeoDataFrame, year: int) -> None:
+    """
+    Build the spatial index of a year's tract geometries: the geometries in STRtree order, and the tract
+    adjacency (tracts whose geometries touch or overlap) as a sparse CSR matrix. Both are saved to
+    'spatial_index/{year}_spatial_index.npz', for point-in-tract and neighbour queries (see `utils/spatial_index.py`).
+
+    An STRtree is bulk-loaded from its geometries (which is all a pickled STRtree holds), so the geometries are
+    persisted as WKB and the tree is rebuilt on load.
+
+    :param gdf: Mastergeometry of the year, with 'GEO_ID' and 'geometry' columns.
+    :type gdf: gpd.GeoDataFrame
+
+    :param year: Data year.
+    :type year: int
+    """
+    gdf = gdf.drop_duplicates(subset = 'GEO_ID').sort_values('GEO_ID')
+    geometries = gdf.geometry.values
+    tree = shapely.STRtree(geometries)
+
+    # Adjacency as CSR: the neighbours of tract i are indices[indptr[i]:indptr[i + 1]]
+    tracts, neighbours = tree.query(geometries, predicate = 'intersects')
+    keep = tracts != neighbours
+    tracts, neighbours = tracts[keep], neighbours[keep]
+    order = np.lexsort((neighbours, tracts))
+    indices = neighbours[order].astype(np.int32)
+    indptr = np.searchsorted(tracts[order], np.arange(len(geometries) + 1)).astype(np.int64)
+
+    wkb = shapely.to_wkb(geometries)
+    offsets = np.concatenate([[0], np.cumsum([len(item) for item in wkb])]).astype(np.int64)
+
+    file_path = f'{spatial_index_folder}{year}_spatial_index.npz'
+    np.savez_compressed(f'{file_path[:-4]}.tmp.npz',
+                        GEO_ID = gdf['GEO_ID'].to_numpy(np.int64),
+                        WKB = np.frombuffer(b''.join(wkb), dtype = np.uint8),
+                        WKB_OFFSETS = offsets,
+                        INDPTR = indptr,
+                        INDICES = indices)
+    os.replace(f'{file_path[:-4]}.tmp.npz', file_path)
+    count_file_bytes('bytes_out', file_path)
 
 
 # ---- Mastergeometry Function ---- #
 def mastergeometry_creation():
     """
-    Create year-segmented mastergeometries for the previously generated masterfiles.
+    Create year-segmented mastergeometries for the previously generated masterfiles, along with their spatial indexes.
 
     Note that `masterfile_creation()` must be called prior to this.
     """
@@ -263,14 +924,21 @@ def mastergeometry_creation():
     for year in years:
         file_path = mastergeometries_folder + f'{year}_mastergeometry.geojson'
         if os.path.exists(file_path):
+            if not os.path.exists(f'{spatial_index_folder}{year}_spatial_index.npz'):
+                spatial_index_creation(gpd.read_file(file_path), year)
             continue
 
         if year == 2010:
-            zip_file_url = f'https://www2.census.gov/geo/tiger/TIGER2010/TRACT/2010/tl_2010_06_tract10.zip'
+            zip_file_url = f'{census_tiger_url}/TIGER2010/TRACT/2010/tl_2010_06_tract10.zip'
         else:
-            zip_file_url = f'https://www2.census.gov/geo/tiger/TIGER{year}/TRACT/tl_{year}_06_tract.zip'
+            zip_file_url = f'{census_tiger_url}/TIGER{year}/TRACT/tl_{year}_06_tract.zip'
         
+        start = time.perf_counter()
         r = req.get(zip_file_url)
+        observe('http.request_seconds', time.perf_counter() - start)
+        count('http.requests')
+        count(f'http.status.{r.status_code}')
+        count('http.bytes_in', len(r.content))
         if r.status_code == 200:
             gdf = gpd.read_file(zip_file_url)
 
@@ -309,6 +977,37 @@ def mastergeometry_creation():
             dummy_gdf = dummy_gdf[['YEAR', 'GEO_ID', 'TRACT', 'CITY', 'COUNTY', 'STATE', 'ABBREV_NAME', 'INTPTLAT', 'INTPTLON', 'geometry']]
             
             dummy_gdf.to_file(file_path, driver='GeoJSON')
+            count_file_bytes('bytes_out', file_path)
+
+            spatial_index_creation(dummy_gdf, year)
+
+
+def vintage_geometry_creation():
+    """
+    Create the tract geometries of each tract vintage ('vintage_geometries/{vintage}_geometry.geojson', named by the
+    vintage's first year), for the app's animated map. A vintage's geometries are rebuilt from its mastergeometries
+    whenever any of them is newer.
+
+    Note that `mastergeometry_creation()` must be called prior to this.
+    """
+    files = [file for file in os.listdir(masterfiles_folder) if file.endswith('masterfile.csv')]
+    df = pd.concat([pd.read_csv(f'{masterfiles_folder}{file}', usecols = ['YEAR', 'GEO_ID']) for file in files], ignore_index = True)
+
+    vintage_geometries_folder = data_folder + 'vintage_geometries/'
+    if not os.path.exists(vintage_geometries_folder):
+        os.makedirs(vintage_geometries_folder)
+
+    for years in tract_vintages(df):
+        year_file_paths = [mastergeometries_folder + f'{year}_mastergeometry.geojson' for year in years]
+        year_file_paths = [file_path for file_path in year_file_paths if os.path.exists(file_path)]
+        file_path = vintage_geometries_folder + f'{years[0]}_geometry.geojson'
+        if not year_file_paths or (os.path.exists(file_path) and os.path.getmtime(file_path) >= max(map(os.path.getmtime, year_file_paths))):
+            continue
+
+        gdf = pd.concat([gpd.read_file(year_file_path)[['GEO_ID', 'geometry']] for year_file_path in year_file_paths], ignore_index = True)
+        gdf = gdf.drop_duplicates(subset = 'GEO_ID', keep = 'last').sort_values('GEO_ID')
+        gdf.to_file(file_path, driver='GeoJSON')
+        count_file_bytes('bytes_out', file_path)
 
 
 # ---- Lat/Lon Center Points Function ---- #
@@ -319,7 +1018,8 @@ def lat_lon_center_points():
 
     Note that `mastergeometry_creation()` must be called prior to this.
     """
-    mastergeometry_files = sorted([f'{mastergeometries_folder}{file}' for file in os.listdir(mastergeometries_folder)])
+    mastergeometry_files = sorted([f'{mastergeometries_folder}{file}' for file in os.listdir(mastergeometries_folder)
+                                   if file.endswith('_mastergeometry.geojson')])
 
     lat_lon_center_points_folder = data_folder + 'lat_lon_center_points/'
     if not os.path.exists(lat_lon_center_points_folder):
@@ -377,7 +1077,7 @@ def census_cpi_series():
     os.remove('data/r-cpi-u-rs.xlsx')
 
 # ---- Inflation-adjust columns ---- #
-def cpi_adjust_cols(ACS_Codes: str | List[str], col_strings: str | List[str]) -> None:
+def cpi_adjust_cols(ACS_Codes: str | List[str], col_strings: str | List[str], n_workers: int | None = None) -> None:
     """
     Dollar-adjust columns, which contain any one of the desired strings, for the ACS datasets
     with the Bureau of Labor Statistics' Retroactive CPI for all Urban Customers (R-CPI-U-RS)
@@ -388,6 +1088,9 @@ def cpi_adjust_cols(ACS_Codes: str | List[str], col_strings: str | List[str]) ->
 
     :param col_strings: The desired strings to specify the set of columns to dollar-adjust.
     :type col_strings: str | List[str]
+
+    :param n_workers: Number of processes writing the masterfiles. Default 'None' (one per CPU core).
+    :type n_workers: int | None
     """
     
     # To ensure the R-CPI-U-RS series exists
@@ -427,14 +1130,7 @@ def cpi_adjust_cols(ACS_Codes: str | List[str], col_strings: str | List[str]) ->
     
     df = df.drop([f'{REC_YEAR}_ADJ_FACTOR'], axis = 1)
     
-    for ABBREV_NAME in df.ABBREV_NAME.unique():
-        dummy_df = df[df.ABBREV_NAME == ABBREV_NAME]
-
-        CSV_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.csv'
-        dummy_df.to_csv(CSV_file_path, index = False)
-
-        JSON_file_path = f'{masterfiles_folder}{ABBREV_NAME}_masterfile.json'
-        dummy_df.to_json(JSON_file_path, orient='records')
+    write_masterfiles(df, n_workers = n_workers)
 
 if __name__ == '__main__':
     census_cpi_series() # <- Could not locate the BLS API for retroactive series. Hence, this will be manually imputed, usually on an annual basis.
\ No newline at end of file